@@ -0,0 +1,73 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+
+class AsyncTTLCache:
+    """
+    异步 TTL + LRU 缓存
+    同一个键的并发加载会合并为一次调用，其余等待者共享结果；加载失败不缓存
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 2048):
+        self.ttl = ttl
+        self.max_size = max(int(max_size), 1)
+        self._data = OrderedDict()  # key -> (expire_at, value)
+        self._inflight = {}  # key -> asyncio.Future
+
+    def get(self, key: Hashable):
+        """读取未过期的缓存，未命中返回 None"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expire_at, value = entry
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable]):
+        """
+        读取缓存，未命中时调用 loader 加载
+        Args:
+            key: 缓存键
+            loader: 无参数的异步加载函数
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            if value is not None:
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
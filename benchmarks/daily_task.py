@@ -0,0 +1,223 @@
+"""
+daily_task 端到端压测
+在 XYBot 根目录运行:
+    python -m plugins.GoodMorning.benchmarks.daily_task --chatrooms 10000 --send-latency 0.005 --output bench.jsonl
+
+用临时 SQLite 数据库预置群聊、黑名单与天气城市，假 WechatAPIClient 模拟通讯录分页与发送耗时，
+天气与历史上的今天请求发往进程内的桩服务（见 stub_server.py），完整执行一次 daily_task。
+输出一行 JSON：规划 / 获取数据 / 发送各阶段耗时、第一条消息发出的时间、tracemalloc 峰值内存与发送吞吐，
+加上 --output 时追加到文件，便于在不同提交之间对比。
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+
+CITIES = ["北京", "上海", "广州", "深圳", "成都", "杭州", "武汉", "西安", "南京", "天津",
+          "苏州", "长沙", "郑州", "东莞", "青岛", "沈阳", "宁波", "昆明", "合肥", "佛山"]
+
+
+class PhaseTimer:
+    """
+    按阶段累计耗时，嵌套调用只计入最内层阶段（例如发送阶段内部的天气获取计入获取阶段）
+    各阶段在流水线中并行执行，嵌套关系按任务分别记录，各阶段耗时之和可能大于总耗时
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._stacks = {}
+
+    def wrap(self, phase: str, func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            stack = self._stacks.setdefault(asyncio.current_task(), [])
+            started = time.perf_counter()
+            stack.append(0.0)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                child = stack.pop()
+                self.totals[phase] = self.totals.get(phase, 0.0) + elapsed - child
+                if stack:
+                    stack[-1] += elapsed
+        return wrapper
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _seed(db, chatrooms: list, blacklist_ratio: float, weather_ratio: float):
+    blacklist_count = int(len(chatrooms) * blacklist_ratio)
+    weather_count = int(len(chatrooms) * weather_ratio)
+    db.add_blacklist_bulk([(wxid, f"群{wxid}") for wxid in chatrooms[:blacklist_count]])
+    db.add_weather_bulk([
+        (wxid, f"群{wxid}", CITIES[i % len(CITIES)])
+        for i, wxid in enumerate(chatrooms[blacklist_count:blacklist_count + weather_count])
+    ])
+    return blacklist_count, weather_count
+
+
+async def _start_stub(latency: float, jitter: float, error_rate: float):
+    from aiohttp import web
+
+    from plugins.GoodMorning.benchmarks.stub_server import StubState, create_app
+
+    runner = web.AppRunner(create_app(StubState(latency, jitter, error_rate, noisy=True, seed=42)))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def run(args) -> dict:
+    from plugins.GoodMorning.benchmarks.fake_bot import FakeWechatAPIClient
+    from plugins.GoodMorning.main import GoodMorning
+    from plugins.GoodMorning.outbound import OutboundQueue
+    from plugins.GoodMorning.providers import ProviderPool, build_providers
+    from plugins.GoodMorning.weather_cache import WeatherCache
+
+    chatrooms = [f"{i}@chatroom" for i in range(args.chatrooms)]
+    plugin = GoodMorning()
+    plugin.enable = True
+    db = plugin._get_db()
+    blacklist_count, weather_count = _seed(db, chatrooms, args.blacklist_ratio, args.weather_ratio)
+
+    runner, base = await _start_stub(args.api_latency, args.api_jitter, args.api_error_rate)
+    provider_configs = {
+        "aa1": {"type": "aa1", "url": base + "/api/api-tianqi-3/index.php?msg={city}&type=1"},
+        "batch": {"type": "batch", "url": base + "/weather/batch?cities={cities}"},
+        "api-m": {"type": "api-m", "url": base + "/api/history"},
+    }
+    plugin.weather_providers = ProviderPool(build_providers([args.weather_provider], provider_configs, plugin.fetcher))
+    plugin.history_providers = ProviderPool(build_providers(["api-m"], provider_configs, plugin.fetcher))
+    # 不读写天气缓存快照，每次都从冷缓存开始
+    plugin.weather_cache = WeatherCache()
+
+    plugin.shard_id, plugin.shard_count = 0, 1
+    plugin.message_log_sample_rate = 0
+    plugin.dispatch_concurrency = args.concurrency
+    plugin.dispatch_rate = args.rate
+    plugin.dispatch_burst = args.concurrency
+    plugin.dispatch_jitter = (0, 0)
+    plugin.dispatch_finish_by = ""
+    # 广播经由插件的发送队列，按压测参数限速，不做单群间隔
+    plugin.outbound = OutboundQueue(rate=args.rate, burst=args.concurrency, chat_interval=0,
+                                    max_size=args.concurrency * 2, workers=args.concurrency,
+                                    metrics=plugin.metrics)
+
+    timer = PhaseTimer()
+    db.async_get_target_plan = timer.wrap("planning", db.async_get_target_plan)
+    db.async_start_run = timer.wrap("planning", db.async_start_run)
+    db.async_add_deliveries = timer.wrap("planning", db.async_add_deliveries)
+    plugin.fetch_weathers = timer.wrap("fetch", plugin.fetch_weathers)
+    plugin.get_history_today = timer.wrap("fetch", plugin.get_history_today)
+    plugin._run_broadcast = timer.wrap("dispatch", plugin._run_broadcast)
+
+    bot = FakeWechatAPIClient(chatrooms, friends=args.friends, page_size=args.page_size,
+                              send_latency=(0, args.send_latency * 2) if args.send_latency else 0.0,
+                              page_latency=args.page_latency, fail_rate=args.fail_rate)
+    bot.get_contract_list = timer.wrap("planning", bot.get_contract_list)
+
+    # 记录第一条早安消息发出的时间
+    first_send = []
+    send_text_message = bot.send_text_message
+
+    async def timed_send(*args, **kwargs):
+        result = await send_text_message(*args, **kwargs)
+        if not first_send:
+            first_send.append(time.perf_counter() - started)
+        return result
+
+    bot.send_text_message = timed_send
+
+    if not args.cold_history:
+        # 与线上一致，历史上的今天已由后台任务提前填充
+        await plugin.fill_history()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        await plugin.daily_task(bot)
+    finally:
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        await plugin.outbound.stop()
+        await plugin.fetcher.close()
+        await runner.cleanup()
+
+    return {
+        "commit": _git_commit(),
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "chatrooms": args.chatrooms,
+            "blacklist": blacklist_count,
+            "weather": weather_count,
+            "friends": args.friends,
+            "page_size": args.page_size,
+            "send_latency": args.send_latency,
+            "api_latency": args.api_latency,
+            "weather_provider": args.weather_provider,
+            "cold_history": args.cold_history,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+        },
+        "planning_s": round(timer.totals.get("planning", 0.0), 4),
+        "fetch_s": round(timer.totals.get("fetch", 0.0), 4),
+        "dispatch_s": round(timer.totals.get("dispatch", 0.0), 4),
+        "first_send_s": round(first_send[0], 4) if first_send else None,
+        "total_s": round(total, 4),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2),
+        "sent": len(bot.sent),
+        "throughput_msg_s": round(len(bot.sent) / total, 1) if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="daily_task 端到端压测")
+    parser.add_argument("--chatrooms", type=int, default=10000)
+    parser.add_argument("--friends", type=int, default=2000, help="通讯录中混入的好友数量")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--page-latency", type=float, default=0.0)
+    parser.add_argument("--blacklist-ratio", type=float, default=0.05)
+    parser.add_argument("--weather-ratio", type=float, default=0.3)
+    parser.add_argument("--send-latency", type=float, default=0.005, help="平均发送耗时（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="桩服务平均响应延迟（秒）")
+    parser.add_argument("--api-jitter", type=float, default=0.02)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--weather-provider", choices=["aa1", "batch"], default="aa1")
+    parser.add_argument("--cold-history", action="store_true", help="不预先填充历史上的今天，广播时实时请求")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=100000.0, help="每秒发送上限")
+    parser.add_argument("--output", default="", help="结果追加写入的 JSON Lines 文件")
+    args = parser.parse_args()
+
+    # GoodMorningDB 是单例，先用临时数据库初始化，插件内部拿到的是同一个实例
+    from plugins.GoodMorning.good_morning_db import GoodMorningDB
+    db_path = os.path.join(tempfile.mkdtemp(prefix="goodmorning-bench-"), "bench.db")
+    GoodMorningDB(f"sqlite:///{db_path}")
+
+    result = asyncio.run(run(args))
+    line = json.dumps(result, ensure_ascii=False)
+    print(line)
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+基准测试用的假 WechatAPIClient
+"""
+import asyncio
+from random import Random
+
+
+class FakeWechatAPIClient:
+    """
+    模拟通讯录分页、发送消息与群昵称查询
+    Args:
+        chatrooms: 群聊 wxid 列表
+        friends: 好友数量（通讯录中混入的非群聊联系人）
+        page_size: 每页联系人数量
+        send_latency: 发送消息的模拟耗时（秒），可以是 (最小, 最大)
+        page_latency: 通讯录每页的模拟耗时（秒）
+        fail_rate: 发送失败的概率
+    """
+
+    def __init__(self, chatrooms: list, friends: int = 0, page_size: int = 100, send_latency=0.0,
+                 page_latency: float = 0.0, fail_rate: float = 0.0, seed: int = 42):
+        self.contacts = list(chatrooms) + [f"wxid_friend{i}" for i in range(friends)]
+        self.page_size = page_size
+        self.send_latency = send_latency if isinstance(send_latency, tuple) else (send_latency, send_latency)
+        self.page_latency = page_latency
+        self.fail_rate = fail_rate
+        self._rng = Random(seed)
+        self.sent = []
+        self.page_calls = 0
+
+    async def get_contract_list(self, wx_seq: int = 0, chatroom_seq: int = 0) -> dict:
+        self.page_calls += 1
+        if self.page_latency:
+            await asyncio.sleep(self.page_latency)
+        start = max(wx_seq, chatroom_seq)
+        end = min(start + self.page_size, len(self.contacts))
+        return {
+            "ContactUsernameList": self.contacts[start:end],
+            "CurrentWxcontactSeq": end,
+            "CurrentChatRoomContactSeq": end,
+            "CountinueFlag": 1 if end < len(self.contacts) else 0,
+        }
+
+    async def send_text_message(self, wxid: str, content: str, at=None):
+        low, high = self.send_latency
+        if high:
+            await asyncio.sleep(self._rng.uniform(low, high))
+        if self.fail_rate and self._rng.random() < self.fail_rate:
+            raise RuntimeError("模拟发送失败")
+        self.sent.append(wxid)
+        return 0, 0, len(self.sent)
+
+    async def send_at_message(self, wxid: str, content: str, at: list):
+        return await self.send_text_message(wxid, content, at)
+
+    async def get_chatroom_nickname(self, chatroom_wxid: str) -> str:
+        return f"群{chatroom_wxid.split('@')[0]}"
+
+    async def get_chatroom_user_name(self, chatroom_wxid: str, wxid: str) -> str:
+        return f"成员{wxid}"
@@ -0,0 +1,111 @@
+"""
+指令分发微基准
+在 XYBot 根目录运行: python -m plugins.GoodMorning.benchmarks.router [消息数]
+
+构造与 daily_taskkkk 相同结构的群消息，其中绝大多数为普通聊天，少量为指令
+（发送者不是管理员，只会走到权限检查），统计 handle_text 的平均耗时，
+并与旧版 re.split + if/elif 的写法对比。
+"""
+import asyncio
+import re
+import sys
+import time
+from random import Random
+
+from plugins.GoodMorning.main import GoodMorning
+from plugins.GoodMorning.outbound import OutboundQueue
+
+
+class _NullBot:
+    """只记录调用次数的假机器人"""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_at_message(self, *args, **kwargs):
+        self.sent += 1
+
+
+_CHAT_TEXTS = [
+    "早上好", "收到", "哈哈哈哈", "今天开会吗？", "@张三 在吗",
+    "这个方案我觉得可以，下午再对一下细节", "[图片]", "👍", "好的好的", "明天见",
+]
+
+
+def build_messages(count: int, plugin: GoodMorning, command_ratio: float = 0.01) -> list:
+    rng = Random(42)
+    commands = list(plugin._commands)
+    now = int(time.time())
+    messages = []
+    for i in range(count):
+        if rng.random() < command_ratio:
+            content = rng.choice(commands)
+        else:
+            content = rng.choice(_CHAT_TEXTS)
+        messages.append({
+            "MsgId": 585326344 + i,
+            "ToWxid": "wxid_bench",
+            "FromWxid": f"{rng.randrange(2000)}@chatroom",
+            "IsGroup": True,
+            "MsgType": 1,
+            "Content": content,
+            "SenderWxid": "wxid_not_admin",
+            "Status": 3,
+            "ImgStatus": 1,
+            "ImgBuf": {"iLen": 0},
+            "CreateTime": now,
+            "MsgSource": "<msgsource>\n\t<pua>1</pua>\n\t<silence>0</silence>\n</msgsource>\n",
+            "PushContent": "",
+            "NewMsgId": 324944634 + i,
+            "MsgSeq": 773900177 + i,
+        })
+    return messages
+
+
+async def _legacy_handle_text(plugin: GoodMorning, bot, message: dict):
+    """旧版分发逻辑（仅解析与匹配，命中后不执行处理函数）"""
+    content = str(message["Content"]).strip()
+    content_parts = re.split(r'[\s\u2005]+', content, 1)
+    cmd = content_parts[0].strip() if len(content_parts) > 0 else ""
+    arg = content_parts[1].strip() if len(content_parts) > 1 else ""
+    if cmd in plugin.blacklist_command_set:
+        return
+    elif cmd in plugin.blacklist_command_get:
+        return
+    elif cmd in plugin.blacklist_command_delete:
+        return
+    elif cmd in plugin.weather_command_set:
+        return arg
+    elif cmd in plugin.weather_command_get:
+        return
+    elif cmd in plugin.weather_command_delete:
+        return
+    elif cmd == "获取用户信息":
+        return
+
+
+async def _run(handler, messages: list) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        await handler(message)
+    return time.perf_counter() - started
+
+
+async def main(count: int):
+    plugin = GoodMorning()
+    # 指令回复经由发送队列，去掉限速与单群间隔，只统计分发本身的耗时
+    plugin.outbound = OutboundQueue(rate=1e9, burst=1000, chat_interval=0, max_size=1000, workers=1)
+    bot = _NullBot()
+    messages = build_messages(count, plugin)
+
+    legacy = await _run(lambda m: _legacy_handle_text(plugin, bot, m), messages)
+    current = await _run(lambda m: plugin.handle_text(bot, m), messages)
+    await plugin.outbound.stop()
+
+    print(f"消息数: {count}, 指令回复: {bot.sent}")
+    print(f"旧版 if/elif: {legacy:.3f}s ({legacy / count * 1e6:.2f}us/条)")
+    print(f"分发表:       {current:.3f}s ({current / count * 1e6:.2f}us/条)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,46 @@
+"""
+基准测试用的接口响应样本
+结构与 v.api.aa1.cn 天气接口、v2.api-m.com 历史上的今天接口一致
+"""
+import json
+from datetime import datetime, timedelta
+
+_WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+_TIANQI = ["晴", "多云", "阴", "小雨", "中雨", "雷阵雨", "小雪"]
+
+# 部分线路会在 JSON 前输出 PHP 警告与 HTML 片段
+_NOISY_PREFIX = (
+    "<br />\n<b>Warning</b>:  file_get_contents(): SSL operation failed with code 1 in "
+    "<b>/www/wwwroot/api/api-tianqi-3/index.php</b> on line <b>42</b><br />\n"
+    "<!-- cache miss, upstream=weather.example {\"code\":\"0\"} -->\n"
+)
+
+
+def weather_payload(city: str, days: int = 7) -> dict:
+    today = datetime.now()
+    data = []
+    for offset in range(days):
+        day = today + timedelta(days=offset)
+        data.append({
+            "riqi": _WEEKDAY_NAMES[day.weekday()],
+            "date": day.strftime("%Y-%m-%d"),
+            "wendu": f"{10 + offset}~{18 + offset}℃",
+            "tianqi": _TIANQI[offset % len(_TIANQI)],
+            "fengdu": "东南风3-4级",
+            "pm": f"{40 + offset * 3}良",
+        })
+    return {"code": "1", "msg": "数据请求成功", "city": city, "data": data}
+
+
+def weather_response(city: str, noisy: bool = True, trailer_bytes: int = 0) -> bytes:
+    """天气接口响应体，noisy 时带前缀噪声，trailer_bytes 为 JSON 之后的多余内容长度"""
+    body = json.dumps(weather_payload(city), ensure_ascii=False)
+    if noisy:
+        body = _NOISY_PREFIX + body + "\n<!-- " + "x" * trailer_bytes + " {} -->"
+    return body.encode("utf-8")
+
+
+def history_response(limit: int = 10) -> bytes:
+    today = datetime.now()
+    events = [f"{1900 + i * 7}年{today.month}月{today.day}日 历史事件 {i}" for i in range(limit)]
+    return json.dumps({"code": 200, "msg": "success", "data": events}, ensure_ascii=False).encode("utf-8")
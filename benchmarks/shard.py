@@ -0,0 +1,121 @@
+"""
+多进程分片广播测试
+在 XYBot 根目录运行: python -m plugins.GoodMorning.benchmarks.shard [进程数] [群数量]
+
+启动多个进程共用一个本地 SQLite 文件，每个进程作为一个分片执行 daily_task，
+最后检查每个群恰好发送一次，并输出各进程耗时。
+加上 --kill 时第一个分片在发送途中退出，用于验证其他进程在租约过期后接管。
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import sys
+import tempfile
+import time
+
+CHATROOMS = 600
+SEND_LATENCY = 0.01
+LEASE_SECONDS = 3
+# 等待所有分片结束的最长时间（秒）
+TIMEOUT = 300
+
+
+def _worker(db_path: str, shard_id: int, shard_count: int, chatroom_count: int, crash: bool, result_queue):
+    from plugins.GoodMorning.good_morning_db import GoodMorningDB
+    # 单例，先用测试数据库初始化，插件内部拿到的是同一个实例
+    GoodMorningDB(f"sqlite:///{db_path}")
+
+    from plugins.GoodMorning.benchmarks.fake_bot import FakeWechatAPIClient
+    from plugins.GoodMorning.main import DEFAULT_CITY, GoodMorning
+    from plugins.GoodMorning.outbound import OutboundQueue
+    from plugins.GoodMorning.sharding import HashRing
+
+    plugin = GoodMorning()
+    plugin.shard_id = shard_id
+    plugin.shard_count = shard_count
+    plugin.shard_ring = HashRing(shard_count)
+    plugin.shard_owner = f"bench-{shard_id}-{os.getpid()}"
+    plugin.shard_lease_seconds = LEASE_SECONDS
+    plugin.dispatch_finish_by = ""
+    plugin.dispatch_rate = 1000
+    plugin.dispatch_burst = 50
+    plugin.dispatch_jitter = (0, 0)
+    plugin.outbound = OutboundQueue(rate=1000, burst=50, chat_interval=0, max_size=100, workers=50)
+    plugin.weather_cache.set(DEFAULT_CITY, f"{DEFAULT_CITY}今日天气：晴")
+
+    async def no_history():
+        return "N/A"
+
+    plugin.get_history_today = no_history
+
+    bot = FakeWechatAPIClient([f"{i}@chatroom" for i in range(chatroom_count)], send_latency=SEND_LATENCY)
+    if crash:
+        original_send = bot.send_text_message
+
+        async def send_then_crash(wxid, content, at=None):
+            if len(bot.sent) >= 20:
+                os._exit(1)
+            return await original_send(wxid, content, at)
+
+        bot.send_text_message = send_then_crash
+
+    async def run():
+        started = time.perf_counter()
+        # 本分片完成后继续等待其他分片，租约过期的分片由存活的进程接管
+        await plugin.daily_task(bot)
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(run())
+    result_queue.put((shard_id, elapsed, bot.sent))
+
+
+def main(worker_count: int, chatroom_count: int, crash: bool):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="goodmorning-shard-"), "shard.db")
+    # 先在主进程建表与迁移，避免多个进程同时对新文件执行 create_all 时冲突
+    from plugins.GoodMorning.good_morning_db import GoodMorningDB
+    GoodMorningDB(f"sqlite:///{db_path}")
+
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker,
+                    args=(db_path, shard_id, worker_count, chatroom_count, crash and shard_id == 0, result_queue))
+        for shard_id in range(worker_count)
+    ]
+    for process in processes:
+        process.start()
+
+    results = []
+    alive = sum(1 for _ in processes) - (1 if crash else 0)
+    deadline = time.monotonic() + TIMEOUT
+    while len(results) < alive:
+        try:
+            results.append(result_queue.get(timeout=1))
+            continue
+        except queue.Empty:
+            pass
+        # 除了 --kill 指定退出的分片，任一进程异常退出或超时都判定失败，不再等待
+        failed = [shard_id for shard_id, process in enumerate(processes)
+                  if not process.is_alive() and process.exitcode != 0 and not (crash and shard_id == 0)]
+        if failed or time.monotonic() > deadline:
+            for process in processes:
+                process.terminate()
+            reason = f"分片 {failed} 异常退出" if failed else f"{TIMEOUT}s 内未全部完成"
+            sys.exit(f"测试失败: {reason}，数据库: {db_path}")
+    for process in processes:
+        process.join()
+
+    sent = [wxid for _, _, wxids in results for wxid in wxids]
+    duplicated = len(sent) - len(set(sent))
+    print(f"数据库: {db_path}")
+    for shard_id, elapsed, wxids in sorted(results):
+        print(f"分片 {shard_id}: 发送 {len(wxids)} 条, 耗时 {elapsed:.2f}s（含等待其他分片完成）")
+    print(f"群总数: {chatroom_count}, 已发送: {len(set(sent))}, 重复发送: {duplicated}")
+    if crash:
+        print("注意: 崩溃的分片在退出前发出的消息不在统计内，处于 sending 状态的群不会重发")
+
+
+if __name__ == "__main__":
+    args = [x for x in sys.argv[1:] if not x.startswith("--")]
+    main(int(args[0]) if args else 3, int(args[1]) if len(args) > 1 else CHATROOMS, "--kill" in sys.argv)
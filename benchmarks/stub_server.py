@@ -0,0 +1,94 @@
+"""
+本地数据源桩服务，回放预置响应，用于离线压测早安任务的吞吐与尾延迟
+在 XYBot 根目录运行:
+    python -m plugins.GoodMorning.benchmarks.stub_server --port 8808 --latency 0.05 --jitter 0.05 --error-rate 0.02
+
+提供的接口:
+    /api/api-tianqi-3/index.php?msg=城市   与 aa1 天气接口相同（单城市）
+    /weather/batch?cities=城市1,城市2      批量天气，{"code": "1", "results": {城市: 天气数据}}
+    /api/history                          与 api-m 历史上的今天接口相同
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+from plugins.GoodMorning.benchmarks.samples import history_response, weather_payload, weather_response
+
+
+class StubState:
+    def __init__(self, latency: float, jitter: float, error_rate: float, noisy: bool, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.noisy = noisy
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def delay(self) -> bool:
+        """模拟网络延迟，返回本次请求是否应当失败"""
+        self.requests += 1
+        await asyncio.sleep(max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0))
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+
+def create_app(state: StubState) -> web.Application:
+    async def weather(request: web.Request) -> web.Response:
+        if await state.delay():
+            return web.Response(status=502, text="bad gateway")
+        city = request.query.get("msg", "")
+        return web.Response(body=weather_response(city, noisy=state.noisy), content_type="text/html")
+
+    async def weather_batch(request: web.Request) -> web.Response:
+        if await state.delay():
+            return web.Response(status=502, text="bad gateway")
+        cities = [city for city in request.query.get("cities", "").split(",") if city]
+        body = {"code": "1", "results": {city: weather_payload(city) for city in cities}}
+        return web.Response(body=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                            content_type="application/json")
+
+    async def history(request: web.Request) -> web.Response:
+        if await state.delay():
+            return web.Response(status=502, text="bad gateway")
+        return web.Response(body=history_response(), content_type="application/json")
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response({"requests": state.requests, "errors": state.errors})
+
+    app = web.Application()
+    app.router.add_get("/api/api-tianqi-3/index.php", weather)
+    app.router.add_get("/weather/batch", weather_batch)
+    app.router.add_get("/api/history", history)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GoodMorning 数据源桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=float, default=0.05, help="平均响应延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟随机抖动范围（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 502 的比例")
+    parser.add_argument("--noisy", action="store_true", help="天气响应前后带噪声内容")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    base = f"http://{args.host}:{args.port}"
+    print("在 config.toml 中配置以下数据源即可指向桩服务:")
+    print(f'[GoodMorning.providers.aa1]\ntype = "aa1"\nurl = "{base}/api/api-tianqi-3/index.php?msg={{city}}&type=1"\n')
+    print(f'[GoodMorning.providers.batch]\ntype = "batch"\nurl = "{base}/weather/batch?cities={{cities}}"\n')
+    print(f'[GoodMorning.providers.api-m]\ntype = "api-m"\nurl = "{base}/api/history"\n')
+
+    state = StubState(args.latency, args.jitter, args.error_rate, args.noisy, args.seed)
+    web.run_app(create_app(state), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+天气响应解析基准
+在 XYBot 根目录运行: python -m plugins.GoodMorning.benchmarks.weather_parser [次数]
+
+对比旧版（每次导入 re/json、编译贪婪正则、对整段文本匹配后 json.loads）
+与线上使用的 read_weather_json（预编译起始标记 + raw_decode 只解析一个对象，对象闭合后停止读取），
+后者按 8KB 分块读取模拟的 aiohttp 响应。
+"""
+import asyncio
+import sys
+import time
+
+from plugins.GoodMorning.benchmarks.samples import weather_response
+from plugins.GoodMorning.weather_parser import format_today_weather, read_weather_json
+
+
+def _legacy_extract(response_text: str):
+    import re
+    import json
+
+    json_pattern = re.compile(r'(\{\s*"code"\s*:\s*"1"[\s\S]*\})')
+    match = json_pattern.search(response_text)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return None
+
+
+class _FakeContent:
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def iter_chunked(self, chunk_size: int):
+        for start in range(0, len(self._body), chunk_size):
+            yield self._body[start:start + chunk_size]
+
+
+class _FakeResponse:
+    """只提供 read_weather_json 用到的 content.iter_chunked"""
+
+    def __init__(self, body: bytes):
+        self.content = _FakeContent(body)
+
+
+def _bench(name: str, func, payload, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func(payload)
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<24}{elapsed / rounds * 1e6:>10.1f}us/次")
+
+
+async def _bench_async(name: str, func, payload, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await func(_FakeResponse(payload))
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<24}{elapsed / rounds * 1e6:>10.1f}us/次")
+
+
+async def main(rounds: int):
+    samples = {
+        "纯 JSON": weather_response("重庆", noisy=False),
+        "带噪声前缀": weather_response("重庆", noisy=True),
+        "带噪声与 64KB 尾部": weather_response("重庆", noisy=True, trailer_bytes=64 * 1024),
+    }
+    for name, body in samples.items():
+        text = body.decode("utf-8")
+        legacy = _legacy_extract(text)
+        print(f"{name}（{len(body)} 字节）旧版解析{'成功' if legacy else '失败'}:")
+        _bench("旧版 str + 贪婪正则", _legacy_extract, text, rounds)
+        await _bench_async("read_weather_json", read_weather_json, body, rounds)
+
+    data = await read_weather_json(_FakeResponse(samples["带噪声前缀"]))
+    print(format_today_weather(data, "重庆"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,98 @@
+import json
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+CITIES_PATH = Path(__file__).absolute().parent / "cities.json"
+
+
+class CityIndex:
+    """
+    城市名称归一化索引
+    把别名、带行政后缀（市、地区、自治州…）或省份前缀的写法以及拼音映射到规范城市名，
+    规范名即天气接口使用的城市名；同音的城市（如 苏州/宿州）不能用拼音匹配
+    """
+
+    def __init__(self, data: dict):
+        self.suffixes = sorted(data.get("suffixes", []), key=len, reverse=True)
+        self.provinces = sorted(data.get("provinces", []), key=len, reverse=True)
+        self._names = {}
+        ambiguous = set()
+        for name, entry in data.get("cities", {}).items():
+            self._names[name] = name
+            for alias in entry.get("aliases", []):
+                self._names[_clean(alias)] = name
+            pinyin = _clean(entry.get("pinyin", ""))
+            if not pinyin:
+                continue
+            if pinyin in self._names and self._names[pinyin] != name:
+                ambiguous.add(pinyin)
+            self._names[pinyin] = name
+        for pinyin in ambiguous:
+            del self._names[pinyin]
+
+    def __len__(self):
+        return len(set(self._names.values()))
+
+    def normalize(self, text: str) -> Optional[str]:
+        """
+        返回规范城市名，无法识别时返回 None
+        依次尝试：原文、去掉行政后缀、去掉省份前缀（及其后缀）
+        """
+        text = _clean(text)
+        if not text:
+            return None
+        city = self._lookup(text)
+        if city is not None:
+            return city
+        for province in self.provinces:
+            if text.startswith(province):
+                rest = text[len(province):]
+                rest = rest[1:] if rest.startswith("省") else rest
+                if rest:
+                    return self._lookup(rest)
+        return None
+
+    def _lookup(self, text: str) -> Optional[str]:
+        city = self._names.get(text)
+        if city is not None:
+            return city
+        for suffix in self.suffixes:
+            if text.endswith(suffix) and len(text) > len(suffix):
+                return self._names.get(text[:-len(suffix)])
+        if text.isascii() and text.endswith("shi") and len(text) > 3:
+            return self._names.get(text[:-3])
+        return None
+
+
+def _clean(text: str) -> str:
+    """全角转半角，去掉空白与拼音中的隔音符号，字母转小写"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return "".join(text.split()).replace("'", "").lower()
+
+
+_index: Optional[CityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_city_index() -> CityIndex:
+    """内置城市词典，首次使用时加载一次"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                with open(CITIES_PATH, encoding="utf-8") as f:
+                    _index = CityIndex(json.load(f))
+                logger.info(f"城市词典加载完成: {len(_index)} 个城市")
+    return _index
+
+
+def normalize_city(text: str) -> Optional[str]:
+    """
+    返回规范城市名；词典中没有的（区县等）返回去掉空白、全角转半角后的原文，交给天气接口识别
+    输入为空时返回 None
+    """
+    return get_city_index().normalize(text) or _clean(text) or None
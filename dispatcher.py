@@ -0,0 +1,202 @@
+import asyncio
+import math
+import time
+from datetime import datetime
+from random import uniform
+from typing import Awaitable, Callable, Optional
+
+from loguru import logger
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+    rate: 每秒补充的令牌数
+    capacity: 桶容量（允许的突发数量）
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(float(rate), 0.001)
+        self.capacity = max(int(capacity), 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float):
+        """调整补充速率（用于截止时间调速）"""
+        self._refill()
+        self.rate = max(float(rate), 0.001)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """获取一个令牌，不足时等待"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DispatchStats:
+    """广播统计"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.duplicated = 0
+        self.wall_time = 0.0
+        self.latencies = []
+
+    def percentile(self, p: float) -> float:
+        """按最近秩法计算发送耗时分位数（秒）"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> str:
+        return (
+            f"总耗时: {self.wall_time:.1f}s, 目标: {self.total}, 成功: {self.sent}, "
+            f"失败: {self.failed}, 超时跳过: {self.skipped}, 已由其他任务发送: {self.duplicated}, "
+            f"p50: {self.percentile(50) * 1000:.0f}ms, p95: {self.percentile(95) * 1000:.0f}ms"
+        )
+
+
+class BroadcastDispatcher:
+    """
+    早安广播分发器
+    在有限并发下发送消息，受令牌桶限速，每次发送前保留随机抖动防风控，
+    并根据截止时间动态调整速率，超过截止时间后剩余目标不再发送
+    """
+
+    def __init__(self, concurrency: int = 5, rate: float = 2.0, burst: int = 5,
+                 jitter: tuple = (0.2, 1.0), finish_by: Optional[datetime] = None):
+        self.concurrency = max(int(concurrency), 1)
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.jitter = (float(jitter[0]), float(jitter[1]))
+        self.finish_by = finish_by
+
+    @staticmethod
+    def parse_finish_by(value: str) -> Optional[datetime]:
+        """将配置中的 "HH:MM" 解析为今天的截止时间，空字符串表示不限制"""
+        if not value:
+            return None
+        hour, minute = (int(x) for x in value.split(":", 1))
+        return datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+    def _remaining_seconds(self) -> Optional[float]:
+        if self.finish_by is None:
+            return None
+        return (self.finish_by - datetime.now()).total_seconds()
+
+    def _pace(self, bucket: TokenBucket, pending: int) -> float:
+        """
+        根据剩余数量与剩余时间调整速率，返回本次可用的最大抖动（秒）
+        """
+        remaining = self._remaining_seconds()
+        if remaining is None or pending <= 0:
+            return self.jitter[1]
+
+        required = pending / max(remaining, 0.001)
+        bucket.set_rate(max(self.rate, required))
+        # 每个并发槽位分到的时间预算，抖动不能超过它
+        budget = remaining * self.concurrency / pending
+        return max(0.0, min(self.jitter[1], budget / 2))
+
+    async def dispatch(self, targets, send: Callable[[str, str], Awaitable]) -> DispatchStats:
+        """
+        分发消息
+        Args:
+            targets: [(chatroom_wxid, message), ...]，或逐条产生目标的异步迭代器（边生成边发送）
+            send: 实际发送函数，参数为 (chatroom_wxid, message)，返回 False 表示已由其他任务发送
+        Returns:
+            DispatchStats；异步迭代器抛出异常时，已取出的目标发送完后再抛出该异常
+        """
+        streaming = not isinstance(targets, (list, tuple))
+        stats = DispatchStats(0 if streaming else len(targets))
+        bucket = TokenBucket(self.rate, self.burst)
+        worker_count = self.concurrency if streaming else min(self.concurrency, max(len(targets), 1))
+        # 流式时队列有上限，发送跟不上时上游暂停生成
+        queue = asyncio.Queue(self.concurrency * 2 if streaming else 0)
+        # 待发送数量，用于截止时间调速（流式时只知道已生成的部分，是下限）
+        pending = 0
+
+        async def feed():
+            nonlocal pending
+            try:
+                async for target in targets:
+                    stats.total += 1
+                    pending += 1
+                    await queue.put(target)
+            finally:
+                for _ in range(worker_count):
+                    await queue.put(None)
+
+        if streaming:
+            feeder = asyncio.create_task(feed())
+        else:
+            feeder = None
+            for target in targets:
+                queue.put_nowait(target)
+            pending = len(targets)
+            for _ in range(worker_count):
+                queue.put_nowait(None)
+
+        started = time.monotonic()
+
+        async def worker():
+            nonlocal pending
+            while True:
+                target = await queue.get()
+                if target is None:
+                    return
+                chatroom, message = target
+
+                remaining = self._remaining_seconds()
+                if remaining is not None and remaining <= 0:
+                    stats.skipped += 1
+                    pending -= 1
+                    continue
+
+                max_jitter = self._pace(bucket, pending)
+                pending -= 1
+                await bucket.acquire()
+                if max_jitter > 0:
+                    await asyncio.sleep(uniform(min(self.jitter[0], max_jitter), max_jitter))
+
+                send_started = time.monotonic()
+                try:
+                    if await send(chatroom, message) is False:
+                        stats.duplicated += 1
+                    else:
+                        stats.sent += 1
+                except Exception as e:
+                    stats.failed += 1
+                    logger.error(f"早安消息发送失败: {chatroom} {e}")
+                finally:
+                    stats.latencies.append(time.monotonic() - send_started)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+        except BaseException:
+            if feeder is not None:
+                feeder.cancel()
+            raise
+
+        stats.wall_time = time.monotonic() - started
+        if stats.skipped:
+            logger.warning(f"超过截止时间 {self.finish_by:%H:%M}，{stats.skipped} 个群未发送")
+        if feeder is not None:
+            # 上游的异常在这里抛出
+            await feeder
+        return stats
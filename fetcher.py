@@ -0,0 +1,70 @@
+import asyncio
+from typing import Optional
+
+from loguru import logger
+
+
+class HttpFetcher:
+    """
+    插件级共享 HTTP 客户端
+    复用同一个 aiohttp.ClientSession（连接池），限制并发，单次请求超时，失败后指数退避重试
+    aiohttp 在第一次请求时才导入，插件加载时不承担它的导入开销
+    """
+
+    def __init__(self, concurrency: int = 10, timeout: float = 10, retries: int = 2, backoff: float = 0.5):
+        self.concurrency = max(int(concurrency), 1)
+        self.timeout = timeout
+        self.retries = max(int(retries), 0)
+        self.backoff = backoff
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    async def close(self):
+        """关闭共享会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, url: str, reader, ssl: bool):
+        import aiohttp
+        session = self._get_session()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with session.get(url, ssl=ssl) as resp:
+                        resp.raise_for_status()
+                        return await reader(resp)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                attempt += 1
+                logger.warning(f"请求失败，{delay:.1f}s 后第{attempt}次重试: {url} {e!r}")
+                await asyncio.sleep(delay)
+
+    async def get_text(self, url: str, ssl: bool = False) -> str:
+        """GET 请求并返回文本"""
+        return await self._request(url, lambda resp: resp.text(), ssl=ssl)
+
+    async def get_json(self, url: str, ssl: bool = False):
+        """GET 请求并返回 JSON"""
+        return await self._request(url, lambda resp: resp.json(content_type=None), ssl=ssl)
+
+    async def get_with(self, url: str, reader, ssl: bool = False):
+        """
+        GET 请求并用自定义函数读取响应（例如流式解析）
+        Args:
+            url: 请求地址
+            reader: 接收 aiohttp 响应的异步函数
+        """
+        return await self._request(url, reader, ssl=ssl)
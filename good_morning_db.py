@@ -1,6 +1,16 @@
 from database.XYBotDB import *
-from datetime import datetime
-from sqlalchemy import delete
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import Text, UniqueConstraint, and_, create_engine, delete, func, inspect, or_, select, text
+from sqlalchemy.orm import sessionmaker
+
+from plugins.GoodMorning.cities import normalize_city
+from plugins.GoodMorning.metrics import DB_SECONDS, DB_WAIT_SECONDS, METRICS
+
 
 class GoodMorningBlacklist(Base):
     """
@@ -12,7 +22,7 @@ class GoodMorningBlacklist(Base):
     """
     __tablename__ = 'good_morning_blacklist'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    chatroom_wxid = Column(String(40), index=True, comment='群聊wxid')
+    chatroom_wxid = Column(String(40), index=True, unique=True, comment='群聊wxid')
     chatroom_nickname = Column(String(255), index=True, comment='群聊昵称')
     update_time = Column(DateTime, default=datetime.now, index=True, comment='更新时间')
 
@@ -29,13 +39,283 @@ class GoodMorningWeather(Base):
     __tablename__ = 'good_morning_weather'
     id = Column(Integer, primary_key=True, autoincrement=True)
     city = Column(String(40), index=True, comment='城市')
-    chatroom_wxid = Column(String(40), index=True, comment='群聊wxid')
+    chatroom_wxid = Column(String(40), index=True, unique=True, comment='群聊wxid')
     chatroom_nickname = Column(String(255), index=True, comment='群聊昵称')
-    update_time = Column(DateTime, default=datetime.now().timestamp, index=True, comment='更新时间')
+    update_time = Column(DateTime, default=datetime.now, index=True, comment='更新时间')
+
+class GoodMorningContactState(Base):
+    """
+    通讯录同步状态表（只有一行）
+    id: 主键
+    wx_seq: 上次同步到的 CurrentWxcontactSeq
+    chatroom_seq: 上次同步到的 CurrentChatRoomContactSeq
+    last_full_sync: 上次全量同步时间
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_contact_state'
+    id = Column(Integer, primary_key=True)
+    wx_seq = Column(Integer, default=0, comment='联系人seq')
+    chatroom_seq = Column(Integer, default=0, comment='群聊seq')
+    last_full_sync = Column(DateTime, comment='上次全量同步时间')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class GoodMorningChatroom(Base):
+    """
+    群聊缓存表
+    id: 主键
+    chatroom_wxid: 群聊wxid
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_chatroom'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chatroom_wxid = Column(String(40), unique=True, comment='群聊wxid')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class GoodMorningHistory(Base):
+    """
+    历史上的今天表，每个日期（月-日）一行，由后台任务提前填充
+    id: 主键
+    month_day: 日期 MM-DD
+    events: 历史事件（JSON 数组）
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_history'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    month_day = Column(String(5), unique=True, comment='日期')
+    events = Column(Text, comment='历史事件')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class GoodMorningRun(Base):
+    """
+    早安广播批次表（每天一行）
+    id: 主键
+    run_date: 日期 YYYY-MM-DD
+    header: 当天消息的公共部分（日期、历史上的今天）
+    status: running / done
+    create_time: 创建时间
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_run'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_date = Column(String(10), unique=True, comment='日期')
+    header = Column(Text, comment='消息公共部分')
+    status = Column(String(16), default='running', comment='状态')
+    create_time = Column(DateTime, default=datetime.now, comment='创建时间')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class GoodMorningDelivery(Base):
+    """
+    早安广播投递表，每个 (日期, 群) 一行，保证同一天同一个群只发送一次
+    id: 主键
+    run_date: 日期 YYYY-MM-DD
+    shard_id: 所属分片
+    chatroom_wxid: 群聊wxid
+    city: 城市
+    hello_index: 问候语序号
+    status: pending / sending / sent / failed
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_delivery'
+    __table_args__ = (UniqueConstraint('run_date', 'chatroom_wxid', name='uq_good_morning_delivery'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_date = Column(String(10), index=True, comment='日期')
+    shard_id = Column(Integer, default=0, comment='分片')
+    chatroom_wxid = Column(String(40), comment='群聊wxid')
+    city = Column(String(40), comment='城市')
+    hello_index = Column(Integer, default=0, comment='问候语序号')
+    status = Column(String(16), default='pending', index=True, comment='状态')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class GoodMorningShardLease(Base):
+    """
+    早安广播分片租约表，每个 (日期, 分片) 一行，多个进程通过它协调分片归属
+    id: 主键
+    run_date: 日期 YYYY-MM-DD
+    shard_id: 分片
+    owner: 当前持有者
+    expires_at: 租约到期时间，到期未续约视为持有者已退出，其他进程可以接管
+    status: planning（边拉取通讯录边发送，计划尚未生成完）/ running（计划已完整保存）/ done
+    update_time: 更新时间
+    """
+    __tablename__ = 'good_morning_shard_lease'
+    __table_args__ = (UniqueConstraint('run_date', 'shard_id', name='uq_good_morning_shard_lease'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_date = Column(String(10), comment='日期')
+    shard_id = Column(Integer, comment='分片')
+    owner = Column(String(64), comment='持有者')
+    expires_at = Column(DateTime, comment='租约到期时间')
+    status = Column(String(16), default='running', comment='状态')
+    update_time = Column(DateTime, default=datetime.now, comment='更新时间')
+
+
+class BlacklistRecord:
+    """黑名单内存记录"""
+    __slots__ = ("chatroom_wxid", "chatroom_nickname", "update_time")
+
+    def __init__(self, chatroom_wxid: str, chatroom_nickname: str, update_time: datetime):
+        self.chatroom_wxid = chatroom_wxid
+        self.chatroom_nickname = chatroom_nickname
+        self.update_time = update_time
+
+
+class WeatherRecord:
+    """天气内存记录"""
+    __slots__ = ("chatroom_wxid", "chatroom_nickname", "city", "update_time")
+
+    def __init__(self, chatroom_wxid: str, chatroom_nickname: str, city: str, update_time: datetime):
+        self.chatroom_wxid = chatroom_wxid
+        self.chatroom_nickname = chatroom_nickname
+        self.city = city
+        self.update_time = update_time
+
+
+def _upsert_statement(dialect_name: str, table, update_columns: list, index_elements: list = ("chatroom_wxid",)):
+    """
+    生成按唯一键（默认 chatroom_wxid）冲突更新的 INSERT 语句
+    """
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in update_columns})
+    else:
+        raise NotImplementedError(f"不支持的数据库: {dialect_name}")
+
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[column] for column in index_elements],
+        set_={column: stmt.excluded[column] for column in update_columns}
+    )
+
+
+def _insert_ignore_statement(dialect_name: str, table, index_elements: list):
+    """
+    生成遇到唯一键冲突时忽略的 INSERT 语句
+    """
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        return insert(table).prefix_with("IGNORE")
+    else:
+        raise NotImplementedError(f"不支持的数据库: {dialect_name}")
+
+    return insert(table).on_conflict_do_nothing(index_elements=[table.c[name] for name in index_elements])
+
+
+def _sort_key(record) -> datetime:
+    # 历史数据中 update_time 可能为空
+    return record.update_time or datetime.min
+
+
+# 迁移时为空的 update_time 填充的时间，排在所有记录之后
+_EPOCH = datetime(1970, 1, 1)
+
 
 class GoodMorningDB(XYBotDB):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, database_url: str = None):
+        """
+        :param database_url: 指定数据库地址（多进程测试、基准测试用），默认使用 XYBot 的数据库
+        """
+        if database_url is None:
+            super().__init__()
+        else:
+            self.database_url = database_url
+            self.engine = create_engine(database_url, connect_args={"timeout": 30}
+                                        if database_url.startswith("sqlite") else {})
+            self.DBSession = sessionmaker(bind=self.engine)
+            Base.metadata.create_all(self.engine)
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="GoodMorningDB")
+        # 黑名单与天气表的内存快照，首次读取时加载，写入时同步更新
+        self._cache_lock = threading.Lock()
+        self._blacklist = None  # chatroom_wxid -> BlacklistRecord
+        self._weather = None  # chatroom_wxid -> WeatherRecord
+        self._blacklist_view = None  # 按更新时间倒序的只读视图
+        self._weather_view = None
+        self._migrate()
+
+    def _migrate(self):
+        """
+        迁移旧表：按 chatroom_wxid 去重，并把普通索引替换为唯一索引；投递表补充分片字段
+        唯一索引创建失败时抛出 RuntimeError，插件不启用
+        """
+        inspector = inspect(self.engine)
+        for table in (GoodMorningBlacklist.__table__, GoodMorningWeather.__table__):
+            index = next(ix for ix in table.indexes if ix.name == f"ix_{table.name}_chatroom_wxid")
+            existing = {ix["name"]: ix for ix in inspector.get_indexes(table.name)}
+            if existing.get(index.name, {}).get("unique"):
+                continue
+
+            try:
+                with self.engine.begin() as conn:
+                    # 每个群只保留最后写入（id 最大）的一行；先查出要删除的 id 再按 id 删除，
+                    # MySQL 不允许 DELETE 的子查询读取同一张表（错误 1093）
+                    keep = select(func.max(table.c.id)).group_by(table.c.chatroom_wxid)
+                    duplicated = list(conn.execute(select(table.c.id).where(table.c.id.not_in(keep))).scalars())
+                    for start in range(0, len(duplicated), 500):
+                        conn.execute(delete(table).where(table.c.id.in_(duplicated[start:start + 500])))
+                    if index.name in existing:
+                        index.drop(conn)
+                    index.create(conn)
+                logger.info(f"迁移 {table.name}: 删除重复行 {len(duplicated)} 条，chatroom_wxid 改为唯一索引")
+            except Exception as e:
+                # 没有唯一索引时按 chatroom_wxid 冲突更新的写入会全部失败（SQLite）或重复插入（MySQL），不能继续运行
+                logger.error(f"迁移 {table.name} 失败: {e}")
+                raise RuntimeError(f"{table.name}.chatroom_wxid 无法改为唯一索引，请手动去重后重启: {e}") from e
+
+        # 键集分页按 (update_time, id) 排序，不能有空值
+        for table in (GoodMorningBlacklist.__table__, GoodMorningWeather.__table__):
+            try:
+                with self.engine.begin() as conn:
+                    result = conn.execute(update(table).where(table.c.update_time.is_(None)).values(update_time=_EPOCH))
+                if result.rowcount:
+                    logger.info(f"迁移 {table.name}: 填充空的 update_time {result.rowcount} 条")
+            except Exception as e:
+                logger.error(f"迁移 {table.name} 失败: {e}")
+
+        # 投递表增加分片字段
+        table = GoodMorningDelivery.__table__
+        if "shard_id" not in {column["name"] for column in inspector.get_columns(table.name)}:
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN shard_id INTEGER DEFAULT 0"))
+                logger.info(f"迁移 {table.name}: 增加 shard_id 字段")
+            except Exception as e:
+                logger.error(f"迁移 {table.name} 失败: {e}")
+
+    async def _execute_async(self, method, *args, **kwargs):
+        """
+        在数据库线程中执行操作并等待结果，不阻塞事件循环
+        执行时间与排队时间分开记录，慢操作日志只反映执行时间；指标在事件循环中记录，不跨线程修改
+        """
+        loop = asyncio.get_running_loop()
+        timing = []
+
+        def timed():
+            timing.append(time.perf_counter())
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing.append(time.perf_counter())
+
+        submitted = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, timed)
+        finally:
+            if len(timing) == 2:
+                name = method.__name__.lstrip("_")
+                METRICS.observe(DB_WAIT_SECONDS, timing[0] - submitted, method=name)
+                METRICS.observe(DB_SECONDS, timing[1] - timing[0], method=name)
     
     # MARK: - 黑名单
     def add_blacklist(self, chatroom_wxid: str, chatroom_nickname: str):
@@ -51,23 +331,15 @@ class GoodMorningDB(XYBotDB):
         session = self.DBSession()
 
         try:
-            result = session.execute(
-                update(GoodMorningBlacklist)
-                .where(GoodMorningBlacklist.chatroom_wxid == chatroom_wxid)
-                .values(
-                    chatroom_nickname=chatroom_nickname,
-                    update_time=datetime.now()
-                )
-            )
-            if result.rowcount == 0:
-                session.add(GoodMorningBlacklist(
-                    chatroom_wxid=chatroom_wxid,
-                    chatroom_nickname=chatroom_nickname,
-                    update_time=datetime.now()
-                ))
-
-            logger.info(f"添加黑名单成功: {chatroom_wxid} {chatroom_nickname}")
+            now = datetime.now()
+            session.execute(
+                _upsert_statement(self.engine.dialect.name, GoodMorningBlacklist.__table__,
+                                  ["chatroom_nickname", "update_time"]),
+                {"chatroom_wxid": chatroom_wxid, "chatroom_nickname": chatroom_nickname, "update_time": now}
+            )
             session.commit()
+            self._cache_put_blacklist(BlacklistRecord(chatroom_wxid, chatroom_nickname, now))
+            logger.info(f"添加黑名单成功: {chatroom_wxid} {chatroom_nickname}")
             return True
         except Exception as e:
             logger.error(f"添加黑名单失败: {chatroom_wxid} {chatroom_nickname} {e}")
@@ -75,7 +347,7 @@ class GoodMorningDB(XYBotDB):
             return False
         finally:
             session.close()
-    
+
     def remove_blacklist(self, chatroom_wxid: str):
         """
         删除黑名单
@@ -89,6 +361,7 @@ class GoodMorningDB(XYBotDB):
                 .where(GoodMorningBlacklist.chatroom_wxid == chatroom_wxid)
             )
             session.commit()
+            self._cache_pop_blacklist(chatroom_wxid)
             logger.info(f"删除黑名单成功: {chatroom_wxid}")
             return True
         except Exception as e:
@@ -98,29 +371,25 @@ class GoodMorningDB(XYBotDB):
         finally:
             session.close()
 
-    def get_blacklist(self) -> [dict]:
+    def get_blacklist(self) -> tuple:
         """
-        获取黑名单
+        获取黑名单（按更新时间倒序），读内存快照
         """
-        session = self.DBSession()
         try:
-            result = session.query(GoodMorningBlacklist).order_by(GoodMorningBlacklist.update_time.desc()).all()
-            logger.info(f"获取黑名单成功: {result}")
-            return [{
-                "chatroom_wxid": item.chatroom_wxid,
-                "chatroom_nickname": item.chatroom_nickname,
-                "update_time": item.update_time
-            } for item in result]
-        except Exception as e:
-            logger.error(f"获取黑名单失败: {e}")
-            return []
-        finally:
-            session.close()
+            self._ensure_blacklist()
+        except Exception:
+            return ()
+        view = self._blacklist_view
+        if view is None:
+            with self._cache_lock:
+                view = self._blacklist_view = tuple(
+                    sorted(self._blacklist.values(), key=_sort_key, reverse=True))
+        return view
 
     # MARK: - 天气
     def add_weather(self, city: str, chatroom_wxid: str, chatroom_nickname: str):
         """
-        添加天气
+        添加天气，城市名归一化后保存，城市为空时不保存
         :param city: 城市
         :param chatroom_wxid: 群聊wxid
         :param chatroom_nickname: 群聊昵称
@@ -128,27 +397,23 @@ class GoodMorningDB(XYBotDB):
         return self._execute_in_queue(self._add_weather, city, chatroom_wxid, chatroom_nickname)
     
     def _add_weather(self, city: str, chatroom_wxid: str, chatroom_nickname: str):
+        normalized = normalize_city(city)
+        if normalized is None:
+            logger.warning(f"添加天气失败，城市为空: {chatroom_wxid} {chatroom_nickname}")
+            return False
+        city = normalized
         session = self.DBSession()
         try:
-            result = session.execute(
-                update(GoodMorningWeather)
-               .where(GoodMorningWeather.chatroom_wxid == chatroom_wxid)
-               .values(
-                    city=city,
-                    chatroom_nickname=chatroom_nickname,
-                    update_time=datetime.now()
-                )
-            )
-            if result.rowcount == 0:
-                session.add(GoodMorningWeather(
-                    city=city,
-                    chatroom_wxid=chatroom_wxid,
-                    chatroom_nickname=chatroom_nickname,
-                    update_time=datetime.now()
-                ))
-            
-            logger.info(f"添加天气成功: {city} {chatroom_wxid} {chatroom_nickname}")
+            now = datetime.now()
+            session.execute(
+                _upsert_statement(self.engine.dialect.name, GoodMorningWeather.__table__,
+                                  ["city", "chatroom_nickname", "update_time"]),
+                {"city": city, "chatroom_wxid": chatroom_wxid, "chatroom_nickname": chatroom_nickname,
+                 "update_time": now}
+            )
             session.commit()
+            self._cache_put_weather(WeatherRecord(chatroom_wxid, chatroom_nickname, city, now))
+            logger.info(f"添加天气成功: {city} {chatroom_wxid} {chatroom_nickname}")
             return True
         except Exception as e:
             logger.error(f"添加天气失败: {city} {chatroom_wxid} {chatroom_nickname} {e}")
@@ -169,6 +434,7 @@ class GoodMorningDB(XYBotDB):
                .where(GoodMorningWeather.chatroom_wxid == chatroom_wxid)        
             )
             session.commit()
+            self._cache_pop_weather(chatroom_wxid)
             logger.info(f"删除天气成功: {chatroom_wxid}")
             return True
         except Exception as e:
@@ -178,23 +444,890 @@ class GoodMorningDB(XYBotDB):
         finally:
             session.close()
 
-    def get_weather(self) -> [dict]:
+    def get_weather(self) -> tuple:
+        """
+        获取天气（按更新时间倒序），读内存快照
+        """
+        try:
+            self._ensure_weather()
+        except Exception:
+            return ()
+        view = self._weather_view
+        if view is None:
+            with self._cache_lock:
+                view = self._weather_view = tuple(
+                    sorted(self._weather.values(), key=_sort_key, reverse=True))
+        return view
+
+    # MARK: - 分页查询
+    def count_blacklist(self) -> int:
+        """黑名单总数"""
+        return self._count(GoodMorningBlacklist)
+
+    def get_blacklist_page(self, limit: int, after: tuple = None) -> [tuple]:
+        """
+        按 (update_time, id) 倒序取一页黑名单（键集分页，顺序与 get_blacklist 一致）
+        :param limit: 最多返回条数
+        :param after: 上一页最后一行的游标 (update_time, id)，None 表示从头开始
+        :return: [(游标, BlacklistRecord), ...]
+        """
+        rows = self._get_page(GoodMorningBlacklist, [GoodMorningBlacklist.chatroom_nickname], limit, after)
+        return [((update_time, row_id), BlacklistRecord(wxid, nickname, update_time))
+                for row_id, wxid, update_time, nickname in rows]
+
+    def count_weather(self) -> int:
+        """已设置城市的群总数"""
+        return self._count(GoodMorningWeather)
+
+    def get_weather_page(self, limit: int, after: tuple = None) -> [tuple]:
+        """
+        按 (update_time, id) 倒序取一页天气设置（键集分页，顺序与 get_weather 一致）
+        :return: [(游标, WeatherRecord), ...]
+        """
+        rows = self._get_page(GoodMorningWeather,
+                              [GoodMorningWeather.chatroom_nickname, GoodMorningWeather.city], limit, after)
+        return [((update_time, row_id), WeatherRecord(wxid, nickname, city, update_time))
+                for row_id, wxid, update_time, nickname, city in rows]
+
+    def _count(self, model) -> int:
+        session = self.DBSession()
+        try:
+            return session.execute(select(func.count()).select_from(model)).scalar() or 0
+        except Exception as e:
+            logger.error(f"统计 {model.__tablename__} 失败: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def _get_page(self, model, columns: list, limit: int, after: tuple = None) -> list:
+        """
+        键集分页：从游标之后继续按 (update_time, id) 倒序读取，不论第几页都只扫描 limit 行
+        返回 [(id, chatroom_wxid, update_time, *columns), ...]
+        """
+        session = self.DBSession()
+        try:
+            query = select(model.id, model.chatroom_wxid, model.update_time, *columns)
+            if after is not None:
+                update_time, row_id = after
+                query = query.where(or_(
+                    model.update_time < update_time,
+                    and_(model.update_time == update_time, model.id < row_id)
+                ))
+            query = query.order_by(model.update_time.desc(), model.id.desc()).limit(limit)
+            return [tuple(row) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"分页查询 {model.__tablename__} 失败: {e}")
+            return []
+        finally:
+            session.close()
+
+    # MARK: - 批量
+    def add_blacklist_bulk(self, rows: list):
+        """
+        批量添加黑名单，单个事务内 executemany
+        :param rows: [(chatroom_wxid, chatroom_nickname), ...]
+        """
+        return self._execute_in_queue(self._add_blacklist_bulk, rows)
+
+    def _add_blacklist_bulk(self, rows: list):
+        if not rows:
+            return True
+        session = self.DBSession()
+        try:
+            now = datetime.now()
+            self._upsert_blacklist_rows(session, rows, now)
+            session.commit()
+            for wxid, nickname in rows:
+                self._cache_put_blacklist(BlacklistRecord(wxid, nickname, now))
+            logger.info(f"批量添加黑名单成功: {len(rows)} 个群")
+            return True
+        except Exception as e:
+            logger.error(f"批量添加黑名单失败: {len(rows)} 个群 {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def add_weather_bulk(self, rows: list):
         """
-        获取天气
+        批量设置天气城市，单个事务内 executemany；城市名归一化，包含空城市时整批不保存
+        :param rows: [(chatroom_wxid, chatroom_nickname, city), ...]
         """
+        return self._execute_in_queue(self._add_weather_bulk, rows)
+
+    def _add_weather_bulk(self, rows: list):
+        rows = [(wxid, nickname, normalize_city(city)) for wxid, nickname, city in rows]
+        if any(city is None for _, _, city in rows):
+            logger.warning("批量设置天气失败，城市为空")
+            return False
+        if not rows:
+            return True
         session = self.DBSession()
         try:
-            result = session.query(GoodMorningWeather).order_by(GoodMorningWeather.update_time.desc()).all()
-            logger.info(f"获取天气成功: {result}")
-            return [{
-                "city": item.city,
-                "chatroom_wxid": item.chatroom_wxid,
-                "chatroom_nickname": item.chatroom_nickname,
-                "update_time": item.update_time 
-            } for item in result]
+            now = datetime.now()
+            self._upsert_weather_rows(session, rows, now)
+            session.commit()
+            for wxid, nickname, city in rows:
+                self._cache_put_weather(WeatherRecord(wxid, nickname, city, now))
+            logger.info(f"批量设置天气成功: {len(rows)} 个群")
+            return True
+        except Exception as e:
+            logger.error(f"批量设置天气失败: {len(rows)} 个群 {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
 
+    def import_bulk(self, blacklist_rows: list, weather_rows: list):
+        """
+        批量导入黑名单与天气城市，在同一个事务中写入，任一部分失败时都不保存
+        :param blacklist_rows: [(chatroom_wxid, chatroom_nickname), ...]
+        :param weather_rows: [(chatroom_wxid, chatroom_nickname, city), ...]
+        """
+        return self._execute_in_queue(self._import_bulk, blacklist_rows, weather_rows)
+
+    def _import_bulk(self, blacklist_rows: list, weather_rows: list):
+        weather_rows = [(wxid, nickname, normalize_city(city)) for wxid, nickname, city in weather_rows]
+        if any(city is None for _, _, city in weather_rows):
+            logger.warning("批量导入失败，城市为空")
+            return False
+        session = self.DBSession()
+        try:
+            now = datetime.now()
+            self._upsert_blacklist_rows(session, blacklist_rows, now)
+            self._upsert_weather_rows(session, weather_rows, now)
+            session.commit()
+            for wxid, nickname in blacklist_rows:
+                self._cache_put_blacklist(BlacklistRecord(wxid, nickname, now))
+            for wxid, nickname, city in weather_rows:
+                self._cache_put_weather(WeatherRecord(wxid, nickname, city, now))
+            logger.info(f"批量导入成功: 黑名单 {len(blacklist_rows)} 个群, 天气 {len(weather_rows)} 个群")
+            return True
         except Exception as e:
-            logger.error(f"获取天气失败: {e}")
+            logger.error(f"批量导入失败: 黑名单 {len(blacklist_rows)} 个群, 天气 {len(weather_rows)} 个群 {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _upsert_blacklist_rows(self, session, rows: list, now: datetime):
+        if not rows:
+            return
+        session.execute(
+            _upsert_statement(self.engine.dialect.name, GoodMorningBlacklist.__table__,
+                              ["chatroom_nickname", "update_time"]),
+            [{"chatroom_wxid": wxid, "chatroom_nickname": nickname, "update_time": now}
+             for wxid, nickname in rows]
+        )
+
+    def _upsert_weather_rows(self, session, rows: list, now: datetime):
+        if not rows:
+            return
+        session.execute(
+            _upsert_statement(self.engine.dialect.name, GoodMorningWeather.__table__,
+                              ["city", "chatroom_nickname", "update_time"]),
+            [{"chatroom_wxid": wxid, "chatroom_nickname": nickname, "city": city, "update_time": now}
+             for wxid, nickname, city in rows]
+        )
+
+    # MARK: - 内存快照
+    def _ensure_blacklist(self):
+        if self._blacklist is not None:
+            return
+        with self._cache_lock:
+            if self._blacklist is not None:
+                return
+            self._blacklist = self._load_blacklist()
+            self._blacklist_view = None
+
+    def _ensure_weather(self):
+        if self._weather is not None:
+            return
+        with self._cache_lock:
+            if self._weather is not None:
+                return
+            self._weather = self._load_weather()
+            self._weather_view = None
+
+    def reload_snapshot(self):
+        """
+        重新从数据库加载黑名单与天气快照（分片部署时其他进程的修改不会同步到本进程的快照）
+        加载完成后整体替换，读取方不会看到未加载的快照；加载失败时保留原快照并抛出异常
+        """
+        return self._execute_in_queue(self._reload_snapshot)
+
+    def _reload_snapshot(self):
+        # 写入都在数据库线程中执行，加载期间不会有写入，只在替换时持锁
+        blacklist, weather = self._load_blacklist(), self._load_weather()
+        with self._cache_lock:
+            self._blacklist, self._weather = blacklist, weather
+            self._blacklist_view = self._weather_view = None
+
+    def _load_blacklist(self) -> dict:
+        session = self.DBSession()
+        try:
+            rows = session.execute(select(
+                GoodMorningBlacklist.chatroom_wxid,
+                GoodMorningBlacklist.chatroom_nickname,
+                GoodMorningBlacklist.update_time
+            ).order_by(GoodMorningBlacklist.update_time))
+            # 按更新时间升序写入，同一个群以最新的记录为准
+            blacklist = {row[0]: BlacklistRecord(*row) for row in rows}
+            logger.info(f"加载黑名单快照: {len(blacklist)} 条")
+            return blacklist
+        except Exception as e:
+            logger.error(f"加载黑名单快照失败: {e}")
+            raise
+        finally:
+            session.close()
+
+    def _load_weather(self) -> dict:
+        session = self.DBSession()
+        try:
+            rows = session.execute(select(
+                GoodMorningWeather.chatroom_wxid,
+                GoodMorningWeather.chatroom_nickname,
+                GoodMorningWeather.city,
+                GoodMorningWeather.update_time
+            ).order_by(GoodMorningWeather.update_time))
+            # 读取时归一化旧数据中的城市名，城市为空的保持原样
+            weather = {
+                wxid: WeatherRecord(wxid, nickname, normalize_city(city) or city, update_time)
+                for wxid, nickname, city, update_time in rows
+            }
+            logger.info(f"加载天气快照: {len(weather)} 条")
+            return weather
+        except Exception as e:
+            logger.error(f"加载天气快照失败: {e}")
+            raise
+        finally:
+            session.close()
+
+    def _cache_put_blacklist(self, record: BlacklistRecord):
+        with self._cache_lock:
+            if self._blacklist is not None:
+                self._blacklist[record.chatroom_wxid] = record
+                self._blacklist_view = None
+
+    def _cache_pop_blacklist(self, chatroom_wxid: str):
+        with self._cache_lock:
+            if self._blacklist is not None and self._blacklist.pop(chatroom_wxid, None) is not None:
+                self._blacklist_view = None
+
+    def _cache_put_weather(self, record: WeatherRecord):
+        with self._cache_lock:
+            if self._weather is not None:
+                self._weather[record.chatroom_wxid] = record
+                self._weather_view = None
+
+    def _cache_pop_weather(self, chatroom_wxid: str):
+        with self._cache_lock:
+            if self._weather is not None and self._weather.pop(chatroom_wxid, None) is not None:
+                self._weather_view = None
+
+    # MARK: - 通讯录缓存
+    def get_contact_state(self) -> dict:
+        """
+        获取通讯录同步状态，从未同步过返回 None
+        """
+        session = self.DBSession()
+        try:
+            state = session.get(GoodMorningContactState, 1)
+            if state is None:
+                return None
+            return {
+                "wx_seq": state.wx_seq,
+                "chatroom_seq": state.chatroom_seq,
+                "last_full_sync": state.last_full_sync
+            }
+        except Exception as e:
+            logger.error(f"获取通讯录同步状态失败: {e}")
+            return None
+        finally:
+            session.close()
+
+    def get_cached_chatrooms(self) -> [str]:
+        """
+        获取缓存的群聊wxid列表
+        """
+        session = self.DBSession()
+        try:
+            return list(session.execute(select(GoodMorningChatroom.chatroom_wxid)).scalars())
+        except Exception as e:
+            logger.error(f"获取群聊缓存失败: {e}")
             return []
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def save_contact_page(self, chatrooms: list, sync_time: datetime):
+        """
+        保存一页通讯录中的群聊，已存在的刷新更新时间
+        :param chatrooms: 本页的群聊wxid
+        :param sync_time: 本次同步开始时间，全量同步结束后据此清理已退出的群
+        """
+        return self._execute_in_queue(self._save_contact_page, chatrooms, sync_time)
+
+    def _save_contact_page(self, chatrooms: list, sync_time: datetime):
+        if not chatrooms:
+            return True
+        session = self.DBSession()
+        try:
+            session.execute(
+                _upsert_statement(self.engine.dialect.name, GoodMorningChatroom.__table__, ["update_time"]),
+                [{"chatroom_wxid": chatroom_wxid, "update_time": sync_time} for chatroom_wxid in dict.fromkeys(chatrooms)]
+            )
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"保存通讯录失败: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def save_contact_state(self, wx_seq: int, chatroom_seq: int, full: bool, sync_time: datetime):
+        """
+        保存通讯录同步进度
+        :param wx_seq: 本次同步到的联系人seq
+        :param chatroom_seq: 本次同步到的群聊seq
+        :param full: 是否全量同步，全量时删除本次没有出现的群
+        :param sync_time: 本次同步开始时间
+        """
+        return self._execute_in_queue(self._save_contact_state, wx_seq, chatroom_seq, full, sync_time)
+
+    def _save_contact_state(self, wx_seq: int, chatroom_seq: int, full: bool, sync_time: datetime):
+        session = self.DBSession()
+        try:
+            now = datetime.now()
+            if full:
+                session.execute(delete(GoodMorningChatroom).where(GoodMorningChatroom.update_time < sync_time))
+
+            state = session.get(GoodMorningContactState, 1)
+            if state is None:
+                state = GoodMorningContactState(id=1)
+                session.add(state)
+            state.wx_seq = wx_seq
+            state.chatroom_seq = chatroom_seq
+            state.update_time = now
+            if full:
+                state.last_full_sync = now
+
+            session.commit()
+            logger.info(f"保存通讯录成功: {'全量' if full else '增量'}")
+            return True
+        except Exception as e:
+            logger.error(f"保存通讯录失败: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    # MARK: - 历史上的今天
+    def get_history(self, month_day: str) -> [str]:
+        """
+        获取某一天的历史事件，按唯一索引读取一行
+        :param month_day: 日期 MM-DD
+        :return: 事件列表，没有记录时返回 None
+        """
+        session = self.DBSession()
+        try:
+            events = session.execute(
+                select(GoodMorningHistory.events).where(GoodMorningHistory.month_day == month_day)
+            ).scalar()
+            return None if events is None else json.loads(events)
+        except Exception as e:
+            logger.error(f"获取历史上的今天失败: {month_day} {e}")
+            return None
+        finally:
+            session.close()
+
+    def get_history_update_times(self, month_days: list) -> dict:
+        """
+        获取多天历史事件的更新时间，用于判断是否需要重新获取
+        :return: {month_day: update_time}，没有记录的日期不在结果中
+        """
+        session = self.DBSession()
+        try:
+            rows = session.execute(
+                select(GoodMorningHistory.month_day, GoodMorningHistory.update_time)
+                .where(GoodMorningHistory.month_day.in_(month_days))
+            )
+            return {month_day: update_time for month_day, update_time in rows}
+        except Exception as e:
+            logger.error(f"获取历史上的今天失败: {e}")
+            return {}
+        finally:
+            session.close()
+
+    def save_history(self, month_day: str, events: list):
+        """
+        保存某一天的历史事件，已存在的覆盖
+        :param month_day: 日期 MM-DD
+        :param events: 事件列表
+        """
+        return self._execute_in_queue(self._save_history, month_day, events)
+
+    def _save_history(self, month_day: str, events: list):
+        session = self.DBSession()
+        try:
+            session.execute(
+                _upsert_statement(self.engine.dialect.name, GoodMorningHistory.__table__,
+                                  ["events", "update_time"], ["month_day"]),
+                {"month_day": month_day, "events": json.dumps(events, ensure_ascii=False),
+                 "update_time": datetime.now()}
+            )
+            session.commit()
+            logger.info(f"保存历史上的今天成功: {month_day} {len(events)} 条")
+            return True
+        except Exception as e:
+            logger.error(f"保存历史上的今天失败: {month_day} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    # MARK: - 广播断点
+    def get_run(self, run_date: str) -> dict:
+        """
+        获取某天的广播批次，不存在返回 None
+        """
+        session = self.DBSession()
+        try:
+            run = session.execute(
+                select(GoodMorningRun).where(GoodMorningRun.run_date == run_date)
+            ).scalar_one_or_none()
+            if run is None:
+                return None
+            return {"run_date": run.run_date, "header": run.header, "status": run.status}
+        except Exception as e:
+            logger.error(f"获取广播批次失败: {run_date} {e}")
+            return None
+        finally:
+            session.close()
+
+    def start_run(self, run_date: str, header: str, deliveries: list, shard_id: int = 0, lease_status: str = "running",
+                  shard_count: int = 1, lease_seconds: float = 0):
+        """
+        创建广播批次并保存某个分片的发送计划，已存在的批次、投递记录与租约保持不变
+        :param run_date: 日期 YYYY-MM-DD
+        :param header: 消息公共部分
+        :param deliveries: [(chatroom_wxid, city, hello_index), ...]
+        :param shard_id: 分片
+        :param lease_status: 租约初始状态，边拉取边发送时为 planning，计划随后用 add_deliveries 追加
+        :param shard_count: 分片总数，同时为其他分片创建 planning 状态的租约，对应进程始终没有启动时也能被接管
+        :param lease_seconds: 其他分片的租约在 lease_seconds 秒后到期，期间留给对应进程认领
+        """
+        return self._execute_in_queue(self._start_run, run_date, header, deliveries, shard_id, lease_status,
+                                      shard_count, lease_seconds)
+
+    def _start_run(self, run_date: str, header: str, deliveries: list, shard_id: int = 0,
+                   lease_status: str = "running", shard_count: int = 1, lease_seconds: float = 0):
+        session = self.DBSession()
+        try:
+            dialect_name = self.engine.dialect.name
+            now = datetime.now()
+            session.execute(
+                _insert_ignore_statement(dialect_name, GoodMorningRun.__table__, ["run_date"]),
+                {"run_date": run_date, "header": header, "status": "running", "create_time": now, "update_time": now}
+            )
+            self._insert_deliveries(session, run_date, deliveries, shard_id, now)
+            grace = now + timedelta(seconds=lease_seconds)
+            session.execute(
+                _insert_ignore_statement(dialect_name, GoodMorningShardLease.__table__, ["run_date", "shard_id"]),
+                [{"run_date": run_date, "shard_id": shard, "status": lease_status if shard == shard_id else "planning",
+                  "expires_at": None if shard == shard_id else grace, "update_time": now}
+                 for shard in sorted(set(range(shard_count)) | {shard_id})]
+            )
+            session.commit()
+            logger.info(f"保存广播计划成功: {run_date} {len(deliveries)} 个群")
+            return True
+        except Exception as e:
+            logger.error(f"保存广播计划失败: {run_date} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _insert_deliveries(self, session, run_date: str, deliveries: list, shard_id: int, now: datetime):
+        if not deliveries:
+            return
+        session.execute(
+            _insert_ignore_statement(self.engine.dialect.name, GoodMorningDelivery.__table__,
+                                     ["run_date", "chatroom_wxid"]),
+            [{"run_date": run_date, "shard_id": shard_id, "chatroom_wxid": chatroom_wxid, "city": city,
+              "hello_index": hello_index, "status": "pending", "update_time": now}
+             for chatroom_wxid, city, hello_index in deliveries]
+        )
+
+    def add_deliveries(self, run_date: str, deliveries: list, shard_id: int = 0):
+        """
+        追加某个分片的投递记录，已存在的 (日期, 群) 保持不变
+        :param deliveries: [(chatroom_wxid, city, hello_index), ...]
+        """
+        return self._execute_in_queue(self._add_deliveries, run_date, deliveries, shard_id)
+
+    def _add_deliveries(self, run_date: str, deliveries: list, shard_id: int = 0):
+        session = self.DBSession()
+        try:
+            self._insert_deliveries(session, run_date, deliveries, shard_id, datetime.now())
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"保存投递记录失败: {run_date} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def get_pending_deliveries(self, run_date: str, shard_id: int = 0) -> [tuple]:
+        """
+        获取某个分片尚未发送的投递记录，读取失败时抛出异常（不能当作没有待发送记录而结束分片）
+        :return: [(chatroom_wxid, city, hello_index), ...]
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                select(GoodMorningDelivery.chatroom_wxid, GoodMorningDelivery.city, GoodMorningDelivery.hello_index)
+                .where(GoodMorningDelivery.run_date == run_date,
+                       GoodMorningDelivery.shard_id == shard_id,
+                       GoodMorningDelivery.status == "pending")
+                .order_by(GoodMorningDelivery.id)
+            )
+            return [tuple(row) for row in result]
+        except Exception as e:
+            logger.error(f"获取待发送记录失败: {run_date} {e}")
+            raise
+        finally:
+            session.close()
+
+    def count_deliveries(self, run_date: str) -> dict:
+        """
+        按状态统计投递记录
+        :return: {status: count}
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                select(GoodMorningDelivery.status, func.count())
+                .where(GoodMorningDelivery.run_date == run_date)
+                .group_by(GoodMorningDelivery.status)
+            )
+            return {status: count for status, count in result}
+        except Exception as e:
+            logger.error(f"统计投递记录失败: {run_date} {e}")
+            return {}
+        finally:
+            session.close()
+
+    def _claim_delivery(self, run_date: str, chatroom_wxid: str) -> bool:
+        """
+        认领一条待发送记录（pending -> sending），认领成功才允许发送
+        返回 False 表示已由其他任务认领；数据库出错时抛出异常，记录保持 pending
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                update(GoodMorningDelivery)
+                .where(GoodMorningDelivery.run_date == run_date,
+                       GoodMorningDelivery.chatroom_wxid == chatroom_wxid,
+                       GoodMorningDelivery.status == "pending")
+                .values(status="sending", update_time=datetime.now())
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"认领投递记录失败: {run_date} {chatroom_wxid} {e}")
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _finish_delivery(self, run_date: str, chatroom_wxid: str, status: str) -> bool:
+        session = self.DBSession()
+        try:
+            session.execute(
+                update(GoodMorningDelivery)
+                .where(GoodMorningDelivery.run_date == run_date, GoodMorningDelivery.chatroom_wxid == chatroom_wxid)
+                .values(status=status, update_time=datetime.now())
+            )
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"更新投递记录失败: {run_date} {chatroom_wxid} {status} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    # MARK: - 分片租约
+    def get_leases(self, run_date: str) -> dict:
+        """
+        获取某天所有分片的租约
+        :return: {shard_id: {"owner", "expires_at", "status"}}
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                select(GoodMorningShardLease).where(GoodMorningShardLease.run_date == run_date)
+            ).scalars()
+            return {lease.shard_id: {"owner": lease.owner, "expires_at": lease.expires_at, "status": lease.status}
+                    for lease in result}
+        except Exception as e:
+            logger.error(f"获取分片租约失败: {run_date} {e}")
+            return {}
+        finally:
+            session.close()
+
+    def _acquire_lease(self, run_date: str, shard_id: int, owner: str, seconds: float) -> bool:
+        """
+        获取或续约分片租约，租约无人持有、属于自己或已过期时才能成功
+        """
+        session = self.DBSession()
+        try:
+            now = datetime.now()
+            result = session.execute(
+                update(GoodMorningShardLease)
+                .where(GoodMorningShardLease.run_date == run_date,
+                       GoodMorningShardLease.shard_id == shard_id,
+                       GoodMorningShardLease.status != "done",
+                       or_(GoodMorningShardLease.owner.is_(None),
+                           GoodMorningShardLease.owner == owner,
+                           GoodMorningShardLease.expires_at < now))
+                .values(owner=owner, expires_at=now + timedelta(seconds=seconds), update_time=now)
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"获取分片租约失败: {run_date} {shard_id} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _set_lease_status(self, run_date: str, shard_id: int, owner: str, status: str) -> bool:
+        """
+        持有者更新分片租约状态（planning -> running）
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                update(GoodMorningShardLease)
+                .where(GoodMorningShardLease.run_date == run_date,
+                       GoodMorningShardLease.shard_id == shard_id,
+                       GoodMorningShardLease.owner == owner)
+                .values(status=status, update_time=datetime.now())
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"更新分片租约失败: {run_date} {shard_id} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _finish_lease(self, run_date: str, shard_id: int, owner: str) -> bool:
+        """
+        标记分片完成
+        """
+        session = self.DBSession()
+        try:
+            result = session.execute(
+                update(GoodMorningShardLease)
+                .where(GoodMorningShardLease.run_date == run_date,
+                       GoodMorningShardLease.shard_id == shard_id,
+                       GoodMorningShardLease.owner == owner)
+                .values(status="done", update_time=datetime.now())
+            )
+            session.commit()
+            return result.rowcount == 1
+        except Exception as e:
+            logger.error(f"更新分片租约失败: {run_date} {shard_id} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    def _finish_run(self, run_date: str) -> bool:
+        session = self.DBSession()
+        try:
+            session.execute(
+                update(GoodMorningRun)
+                .where(GoodMorningRun.run_date == run_date)
+                .values(status="done", update_time=datetime.now())
+            )
+            session.commit()
+            logger.info(f"广播批次完成: {run_date}")
+            return True
+        except Exception as e:
+            logger.error(f"更新广播批次失败: {run_date} {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+    # MARK: - 索引
+    def get_target_plan(self, chatrooms: list, default_city: str) -> [tuple]:
+        """
+        解析发送计划，剔除黑名单并确定每个群的城市（读内存快照），快照加载失败时抛出异常
+        :param chatrooms: 候选群聊wxid列表
+        :param default_city: 未设置城市时使用的默认城市
+        :return: [(chatroom_wxid, city), ...]
+        """
+        self._ensure_blacklist()
+        self._ensure_weather()
+
+        blacklist = self._blacklist
+        weather = self._weather
+        plan = []
+        for chatroom in chatrooms:
+            if chatroom in blacklist:
+                continue
+            record = weather.get(chatroom)
+            plan.append((chatroom, record.city if record is not None else default_city))
+        return plan
+
+    # MARK: - 异步接口
+    async def async_add_blacklist(self, chatroom_wxid: str, chatroom_nickname: str) -> bool:
+        """添加黑名单（异步）"""
+        return await self._execute_async(self._add_blacklist, chatroom_wxid, chatroom_nickname)
+
+    async def async_remove_blacklist(self, chatroom_wxid: str) -> bool:
+        """删除黑名单（异步）"""
+        return await self._execute_async(self.remove_blacklist, chatroom_wxid)
+
+    async def async_get_blacklist(self) -> tuple:
+        """获取黑名单（异步），快照已加载时直接返回"""
+        if self._blacklist is None:
+            await self._execute_async(self._ensure_blacklist)
+        return self.get_blacklist()
+
+    async def async_add_weather(self, city: str, chatroom_wxid: str, chatroom_nickname: str) -> bool:
+        """添加天气（异步）"""
+        return await self._execute_async(self._add_weather, city, chatroom_wxid, chatroom_nickname)
+
+    async def async_remove_weather(self, chatroom_wxid: str) -> bool:
+        """删除天气（异步）"""
+        return await self._execute_async(self.remove_weather, chatroom_wxid)
+
+    async def async_get_weather(self) -> tuple:
+        """获取天气（异步），快照已加载时直接返回"""
+        if self._weather is None:
+            await self._execute_async(self._ensure_weather)
+        return self.get_weather()
+
+    async def async_count_blacklist(self) -> int:
+        """黑名单总数（异步）"""
+        return await self._execute_async(self.count_blacklist)
+
+    async def async_get_blacklist_page(self, limit: int, after: tuple = None) -> [tuple]:
+        """键集分页读取黑名单（异步）"""
+        return await self._execute_async(self.get_blacklist_page, limit, after)
+
+    async def async_count_weather(self) -> int:
+        """已设置城市的群总数（异步）"""
+        return await self._execute_async(self.count_weather)
+
+    async def async_get_weather_page(self, limit: int, after: tuple = None) -> [tuple]:
+        """键集分页读取天气设置（异步）"""
+        return await self._execute_async(self.get_weather_page, limit, after)
+
+    async def async_add_blacklist_bulk(self, rows: list) -> bool:
+        """批量添加黑名单（异步）"""
+        return await self._execute_async(self._add_blacklist_bulk, rows)
+
+    async def async_add_weather_bulk(self, rows: list) -> bool:
+        """批量设置天气城市（异步）"""
+        return await self._execute_async(self._add_weather_bulk, rows)
+
+    async def async_import_bulk(self, blacklist_rows: list, weather_rows: list) -> bool:
+        """批量导入黑名单与天气城市，单个事务（异步）"""
+        return await self._execute_async(self._import_bulk, blacklist_rows, weather_rows)
+
+    async def async_get_contact_state(self) -> dict:
+        """获取通讯录同步状态（异步）"""
+        return await self._execute_async(self.get_contact_state)
+
+    async def async_get_cached_chatrooms(self) -> [str]:
+        """获取缓存的群聊wxid列表（异步）"""
+        return await self._execute_async(self.get_cached_chatrooms)
+
+    async def async_save_contact_page(self, chatrooms: list, sync_time: datetime) -> bool:
+        """保存一页通讯录中的群聊（异步）"""
+        return await self._execute_async(self._save_contact_page, chatrooms, sync_time)
+
+    async def async_save_contact_state(self, wx_seq: int, chatroom_seq: int, full: bool, sync_time: datetime) -> bool:
+        """保存通讯录同步进度（异步）"""
+        return await self._execute_async(self._save_contact_state, wx_seq, chatroom_seq, full, sync_time)
+
+    async def async_get_history(self, month_day: str) -> [str]:
+        """获取某一天的历史事件（异步）"""
+        return await self._execute_async(self.get_history, month_day)
+
+    async def async_get_history_update_times(self, month_days: list) -> dict:
+        """获取多天历史事件的更新时间（异步）"""
+        return await self._execute_async(self.get_history_update_times, month_days)
+
+    async def async_save_history(self, month_day: str, events: list) -> bool:
+        """保存某一天的历史事件（异步）"""
+        return await self._execute_async(self._save_history, month_day, events)
+
+    async def async_get_target_plan(self, chatrooms: list, default_city: str) -> [tuple]:
+        """解析发送计划（异步），快照已加载时不经过数据库线程"""
+        if self._blacklist is None or self._weather is None:
+            return await self._execute_async(self.get_target_plan, chatrooms, default_city)
+        return self.get_target_plan(chatrooms, default_city)
+
+    async def async_reload_snapshot(self):
+        """重新加载黑名单与天气快照（异步）"""
+        return await self._execute_async(self._reload_snapshot)
+
+    async def async_get_run(self, run_date: str) -> dict:
+        """获取广播批次（异步）"""
+        return await self._execute_async(self.get_run, run_date)
+
+    async def async_start_run(self, run_date: str, header: str, deliveries: list, shard_id: int = 0,
+                              lease_status: str = "running", shard_count: int = 1, lease_seconds: float = 0) -> bool:
+        """创建广播批次并保存某个分片的发送计划（异步）"""
+        return await self._execute_async(self._start_run, run_date, header, deliveries, shard_id, lease_status,
+                                         shard_count, lease_seconds)
+
+    async def async_add_deliveries(self, run_date: str, deliveries: list, shard_id: int = 0) -> bool:
+        """追加某个分片的投递记录（异步）"""
+        return await self._execute_async(self._add_deliveries, run_date, deliveries, shard_id)
+
+    async def async_get_pending_deliveries(self, run_date: str, shard_id: int = 0) -> [tuple]:
+        """获取某个分片尚未发送的投递记录（异步）"""
+        return await self._execute_async(self.get_pending_deliveries, run_date, shard_id)
+
+    async def async_count_deliveries(self, run_date: str) -> dict:
+        """按状态统计投递记录（异步）"""
+        return await self._execute_async(self.count_deliveries, run_date)
+
+    async def async_claim_delivery(self, run_date: str, chatroom_wxid: str) -> bool:
+        """认领一条待发送记录（异步）"""
+        return await self._execute_async(self._claim_delivery, run_date, chatroom_wxid)
+
+    async def async_finish_delivery(self, run_date: str, chatroom_wxid: str, status: str) -> bool:
+        """更新投递结果（异步）"""
+        return await self._execute_async(self._finish_delivery, run_date, chatroom_wxid, status)
+
+    async def async_finish_run(self, run_date: str) -> bool:
+        """标记广播批次完成（异步）"""
+        return await self._execute_async(self._finish_run, run_date)
+
+    async def async_get_leases(self, run_date: str) -> dict:
+        """获取某天所有分片的租约（异步）"""
+        return await self._execute_async(self.get_leases, run_date)
+
+    async def async_acquire_lease(self, run_date: str, shard_id: int, owner: str, seconds: float) -> bool:
+        """获取或续约分片租约（异步）"""
+        return await self._execute_async(self._acquire_lease, run_date, shard_id, owner, seconds)
+
+    async def async_set_lease_status(self, run_date: str, shard_id: int, owner: str, status: str) -> bool:
+        """更新分片租约状态（异步）"""
+        return await self._execute_async(self._set_lease_status, run_date, shard_id, owner, status)
+
+    async def async_finish_lease(self, run_date: str, shard_id: int, owner: str) -> bool:
+        """标记分片完成（异步）"""
+        return await self._execute_async(self._finish_lease, run_date, shard_id, owner)
@@ -1,9 +1,14 @@
 import asyncio
+import fnmatch
+import os
+import socket
+import time
 import tomllib
-from datetime import datetime
-from random import randint
+from contextlib import aclosing
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from random import random, randrange
 
-import aiohttp
 import re
 
 from WechatAPI import WechatAPIClient
@@ -12,7 +17,75 @@ from utils.plugin_base import PluginBase
 
 from loguru import logger
 
-from plugins.GoodMorning.good_morning_db import GoodMorningDB
+from plugins.GoodMorning.async_cache import AsyncTTLCache
+from plugins.GoodMorning.cities import normalize_city
+from plugins.GoodMorning.dispatcher import BroadcastDispatcher
+from plugins.GoodMorning.fetcher import HttpFetcher
+from plugins.GoodMorning.message_template import GreetingTemplate
+from plugins.GoodMorning.metrics import (BROADCAST_TOTAL, DB_SECONDS, HISTORY_TOTAL, METRICS, SEND_SECONDS,
+                                         SPAN_SECONDS, WEATHER_TOTAL, InstrumentedBot)
+from plugins.GoodMorning.outbound import PRIORITY_BULK, PRIORITY_INTERACTIVE, OutboundQueue, QueuedBot
+from plugins.GoodMorning.paging import paginate_rows, utf8_len
+from plugins.GoodMorning.pipeline import buffered
+from plugins.GoodMorning.providers import ProviderPool, build_providers
+from plugins.GoodMorning.sharding import HashRing
+from plugins.GoodMorning.weather_cache import WeatherCache
+
+# 指令与参数之间的分隔符（含 @ 后的特殊空格）
+_COMMAND_SPLIT = re.compile(r'[\s\u2005]+')
+
+# 未设置城市的群使用的默认城市
+DEFAULT_CITY = "重庆"
+
+# 增量同步时缓存的群按此大小分批进入发送流水线
+_CACHED_PAGE_SIZE = 100
+
+# 列表指令每次从数据库读取的条数
+_LIST_FETCH_SIZE = 50
+
+# 配置文件按模块位置查找，不依赖启动时的工作目录（不解析软链接，插件目录可以链接进来）
+PLUGIN_DIR = Path(__file__).absolute().parent
+CONFIG_PATH = PLUGIN_DIR / "config.toml"
+MAIN_CONFIG_PATH = Path(__file__).absolute().parents[2] / "main_config.toml"
+
+
+def _plugin_path(value: str) -> str:
+    """配置中的文件路径，相对路径相对插件目录；留空表示不使用"""
+    if not value:
+        return ""
+    return str(PLUGIN_DIR / value)
+
+
+def _config_mtimes() -> tuple:
+    """插件配置与主配置的修改时间，用于判断是否需要重新加载"""
+    mtimes = []
+    for path in (CONFIG_PATH, MAIN_CONFIG_PATH):
+        try:
+            mtimes.append(path.stat().st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+def _check_finish_by(value: str) -> str:
+    """校验截止时间 HH:MM，格式错误时记录警告并按不限制处理，避免到发送时才报错"""
+    try:
+        BroadcastDispatcher.parse_finish_by(value)
+    except (AttributeError, TypeError, ValueError) as e:
+        logger.warning(f"dispatch_finish_by 格式错误，按不限制处理: {value!r} {e}")
+        return ""
+    return value
+
+
+def _read_config() -> tuple:
+    """读取并返回 (插件配置, 主配置)"""
+    with open(CONFIG_PATH, "rb") as f:
+        plugin_config = tomllib.load(f)
+
+    with open(MAIN_CONFIG_PATH, "rb") as f:
+        main_config = tomllib.load(f)
+
+    return plugin_config["GoodMorning"], main_config["XYBot"]
 
 
 class GoodMorning(PluginBase):
@@ -26,78 +99,249 @@ class GoodMorning(PluginBase):
     def __init__(self):
         super().__init__()
 
-        with open("plugins/GoodMorning/config.toml", "rb") as f:
-            plugin_config = tomllib.load(f)
+        self._config_mtimes = _config_mtimes()
+        self._config_checked = time.monotonic()
+        config, main_config = _read_config()
 
-        with open("main_config.toml", "rb") as f:
-            main_config = tomllib.load(f)
+        # 以下组件只在启动时按配置创建，修改后需要重启
+        # 分片：多个进程按一致性哈希分担群聊，通过数据库租约协调
+        self.shard_id = config.get("shard_id", 0)
+        self.shard_count = config.get("shard_count", 1)
+        self.shard_lease_seconds = config.get("shard_lease_seconds", 60)
+        self.shard_takeover = config.get("shard_takeover", True)
+        self.shard_owner = f"{socket.gethostname()}-{self.shard_id}"
+        self.shard_ring = HashRing(self.shard_count)
 
-        main_config = main_config["XYBot"]
-        # 获取管理员人员
-        self.admins = main_config["managers"]
-        
-        config = plugin_config["GoodMorning"]
-
-        self.enable = config["enable"]
-        self.hello_texts = config["hello_texts"] 
-        # 黑名单
-        self.blacklist_command_set = config["blacklist_command_set"]
-        self.blacklist_command_get = config["blacklist_command_get"]
-        self.blacklist_command_delete = config["blacklist_command_delete"]
-        # 天气
-        self.weather_command_set = config["weather_command_set"]
-        self.weather_command_get = config["weather_command_get"]
-        self.weather_command_delete = config["weather_command_delete"]
-        
-        # 初始化db
-        self.db = GoodMorningDB()
+        # 数据库首次使用时才初始化，见 _get_db
+        self._db = None
+        # 共享 HTTP 客户端（aiohttp 在第一次请求时才导入）
+        self.fetcher = HttpFetcher(
+            concurrency=config.get("http_concurrency", 10),
+            timeout=config.get("http_timeout", 10),
+            retries=config.get("http_retries", 2),
+            backoff=config.get("http_backoff", 0.5)
+        )
+        # 天气缓存，快照在启用插件时读取
+        self.weather_cache = WeatherCache(
+            ttl=config.get("weather_cache_ttl", 6 * 3600),
+            max_size=config.get("weather_cache_size", 1024),
+            snapshot_path=_plugin_path(config.get("weather_cache_snapshot", ""))
+        )
+        # 同一时间只运行一个广播批次
+        self._broadcast_lock = asyncio.Lock()
+        self._resume_task = None
+        # 群昵称、群成员昵称缓存
+        self.name_cache = AsyncTTLCache(
+            ttl=config.get("name_cache_ttl", 600),
+            max_size=config.get("name_cache_size", 4096)
+        )
+        self.metrics = METRICS
+        # 插件级发送队列：交互回复优先于早安广播，全局与单群限速
+        self.outbound = OutboundQueue(
+            rate=config.get("outbound_rate", 5.0),
+            burst=config.get("outbound_burst", 5),
+            chat_interval=config.get("outbound_chat_interval", 1.0),
+            max_size=config.get("outbound_max_size", 100),
+            workers=config.get("outbound_workers", 5),
+            metrics=self.metrics
+        )
+        self._bot_proxies = None
+        # 后台发送任务（保存引用，避免被垃圾回收）
+        self._background_tasks = set()
+        # 列表指令每页的起点：(群, 指令) -> (总数, {页码: (游标, 已显示行数)})
+        self.list_cursors = AsyncTTLCache(ttl=600, max_size=256)
+
+        # 其余配置可以热重载
+        self._apply_settings(self._parse_settings(config, main_config))
+
+    def _parse_settings(self, config: dict, main_config: dict) -> dict:
+        """
+        把可热重载的配置解析为 {属性名: 值}，解析失败抛出异常，不影响当前配置
+        """
+        settings = {
+            # 获取管理员人员
+            "admins": frozenset(main_config["managers"]),
+            "enable": config["enable"],
+            "hello_texts": config["hello_texts"],
+            # 黑名单
+            "blacklist_command_set": config["blacklist_command_set"],
+            "blacklist_command_get": config["blacklist_command_get"],
+            "blacklist_command_delete": config["blacklist_command_delete"],
+            # 天气
+            "weather_command_set": config["weather_command_set"],
+            "weather_command_get": config["weather_command_get"],
+            "weather_command_delete": config["weather_command_delete"],
+            # 批量管理
+            "blacklist_command_bulk_set": config.get("blacklist_command_bulk_set", []),
+            "weather_command_bulk_set": config.get("weather_command_bulk_set", []),
+            "bulk_import_command": config.get("bulk_import_command", []),
+            "bulk_import_file": _plugin_path(config.get("bulk_import_file", "bulk_import.toml")),
+            # 广播发送
+            "dispatch_concurrency": config.get("dispatch_concurrency", 5),
+            "dispatch_rate": config.get("dispatch_rate", 2.0),
+            "dispatch_burst": config.get("dispatch_burst", 5),
+            "dispatch_jitter": (config.get("dispatch_jitter_min", 0.2), config.get("dispatch_jitter_max", 1.0)),
+            "dispatch_finish_by": _check_finish_by(config.get("dispatch_finish_by", "")),
+            # 早安消息日志抽样比例（0~1），0 表示不逐条记录
+            "message_log_sample_rate": config.get("message_log_sample_rate", 0.0),
+            # 通讯录全量同步间隔（天）
+            "contact_full_resync_days": config.get("contact_full_resync_days", 7),
+            # 早安广播流水线中通讯录分页最多提前读取的页数
+            "pipeline_buffer_pages": config.get("pipeline_buffer_pages", 4),
+            # 列表回复每条消息的字节上限
+            "list_reply_max_bytes": config.get("list_reply_max_bytes", 2000),
+            # 天气、历史上的今天数据源，按实测耗时与失败率故障切换
+            "weather_providers": ProviderPool(build_providers(
+                config.get("weather_providers", ["aa1"]), config.get("providers", {}), self.fetcher)),
+            "history_providers": ProviderPool(build_providers(
+                config.get("history_providers", ["api-m"]), config.get("providers", {}), self.fetcher)),
+            # 历史上的今天提前获取的天数（数据源支持按日期获取时）与重新获取间隔（天）
+            "history_prefetch_days": config.get("history_prefetch_days", 7),
+            "history_refresh_days": config.get("history_refresh_days", 300),
+            # 指标导出与慢操作日志阈值
+            "metrics_prometheus_file": _plugin_path(config.get("metrics_prometheus_file", "")),
+            "metrics_json_file": _plugin_path(config.get("metrics_json_file", "")),
+            "slow_thresholds": {
+                SPAN_SECONDS: config.get("slow_span_seconds", 60),
+                DB_SECONDS: config.get("slow_db_seconds", 0.5),
+                SEND_SECONDS: config.get("slow_send_seconds", 5),
+            },
+            # 配置文件检查间隔（秒），0 表示不热重载
+            "config_reload_interval": config.get("config_reload_interval", 5),
+        }
+        # 指令分发表
+        commands = self._build_command_table(settings)
+        settings["_commands"] = commands
+        settings["_command_prefixes"] = frozenset(command[0] for command in commands)
+        return settings
+
+    def _apply_settings(self, settings: dict):
+        # 一次性替换全部属性，中间没有 await，处理中的消息不会看到新旧混合的配置
+        self.__dict__.update(settings)
+        self.metrics.slow_thresholds = self.slow_thresholds
+
+    def reload_config(self, force: bool = False) -> bool:
+        """配置文件有变化时重新加载，返回是否已重新加载"""
+        mtimes = _config_mtimes()
+        if not force and mtimes == self._config_mtimes:
+            return False
+        # 无论成功与否都记录本次的修改时间，解析失败的文件不会反复报错
+        self._config_mtimes = mtimes
+        try:
+            settings = self._parse_settings(*_read_config())
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            logger.error(f"重新加载配置失败，继续使用原配置: {e!r}")
+            return False
+        self._apply_settings(settings)
+        logger.info(f"GoodMorning 配置已重新加载，指令 {len(self._commands)} 个")
+        return True
+
+    def _maybe_reload_config(self):
+        """按 config_reload_interval 节流检查配置文件的修改时间"""
+        if not self.config_reload_interval:
+            return
+        now = time.monotonic()
+        if now - self._config_checked < self.config_reload_interval:
+            return
+        self._config_checked = now
+        self.reload_config()
+
+    def _get_db(self):
+        """
+        首次使用时才导入 SQLAlchemy 并初始化数据库
+        不用公开属性：宿主按 dir()/getattr 扫描处理函数时会读取属性，在事件循环中同步执行迁移
+        """
+        if self._db is None:
+            from plugins.GoodMorning.good_morning_db import GoodMorningDB
+            self._db = GoodMorningDB()
+        return self._db
+
+    async def on_enable(self, bot=None):
+        await super().on_enable(bot)
+        if self.enable:
+            # 数据库初始化（含迁移）与快照读取放到线程中，不阻塞事件循环
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._get_db)
+            except RuntimeError as e:
+                # 迁移失败时继续写入会破坏数据，停用插件
+                logger.error(f"GoodMorning 数据库迁移失败，插件已停用: {e}")
+                self.enable = False
+                return
+            await loop.run_in_executor(None, self.weather_cache.load_snapshot)
+        # 继续发送重启前未完成的早安广播
+        if bot is not None and self.enable:
+            self._resume_task = asyncio.create_task(self.resume_daily_task(bot))
+
+    async def on_disable(self):
+        await super().on_disable()
+        # 先停止续发广播与后台回复，否则发送队列会在下一次提交时重新启动
+        tasks = [task for task in (self._resume_task, *self._background_tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._resume_task = None
+        await self.outbound.stop()
+        await self.fetcher.close()
 
     # MARK: - 文本消息处理
     @on_text_message()
     async def handle_text(self, bot: WechatAPIClient, message: dict):
+        self._maybe_reload_config()
         if not self.enable:
             return
         
-        # 指令解析
+        # 绝大多数消息不是指令，先按首字符过滤，避免无谓的切分
         content = str(message["Content"]).strip()
-        content_parts = re.split(r'[\s\u2005]+', content, 1)
-        cmd = content_parts[0].strip() if len(content_parts) > 0 else ""
-        arg = content_parts[1].strip() if len(content_parts) > 1 else ""
-
-        if cmd in self.blacklist_command_set:
-            # 设置黑名单
-            await self.blacklist_set(bot, message)
-        elif cmd in self.blacklist_command_get:
-            # 查询黑名单
-            await self.blacklist_get(bot, message)
-        elif cmd in self.blacklist_command_delete:
-            # 删除黑名单
-            await self.blacklist_delete(bot, message)
-        elif cmd in self.weather_command_set:
-            # 设置天气
-            await self.weather_set(bot, message, arg)
-        elif cmd in self.weather_command_get:
-            # 查询天气
-            await self.weather_get(bot, message)
-        elif cmd in self.weather_command_delete:
-            # 删除天气
-            await self.weather_delete(bot, message)
-        elif cmd == "获取用户信息":
-            # 获取用户信息
-            await self.get_user_info(bot, message)
-        else:
+        if not content or content[0] not in self._command_prefixes:
             return
 
+        # 指令解析
+        content_parts = _COMMAND_SPLIT.split(content, 1)
+        cmd = content_parts[0]
+        entry = self._commands.get(cmd)
+        if entry is None:
+            return
+
+        handler, with_arg = entry
+        bot = self._outbound_bot(bot, PRIORITY_INTERACTIVE)
+        if with_arg:
+            arg = content_parts[1].strip() if len(content_parts) > 1 else ""
+            await handler(bot, message, arg)
+        else:
+            await handler(bot, message)
+
+    def _build_command_table(self, settings: dict) -> dict:
+        """根据配置构建 指令 -> (处理函数, 是否需要参数) 的分发表"""
+        routes = [
+            (settings["blacklist_command_set"], self.blacklist_set, False),
+            (settings["blacklist_command_get"], self.blacklist_get, True),
+            (settings["blacklist_command_delete"], self.blacklist_delete, False),
+            (settings["weather_command_set"], self.weather_set, True),
+            (settings["weather_command_get"], self.weather_get, True),
+            (settings["weather_command_delete"], self.weather_delete, False),
+            (settings["blacklist_command_bulk_set"], self.blacklist_bulk_set, True),
+            (settings["weather_command_bulk_set"], self.weather_bulk_set, True),
+            (settings["bulk_import_command"], self.bulk_import, False),
+            (["获取用户信息"], self.get_user_info, False),
+        ]
+        table = {}
+        for commands, handler, with_arg in routes:
+            for command in commands:
+                table[command] = (handler, with_arg)
+        return table
+
     async def get_user_info(self, bot: WechatAPIClient, message: dict):
         """获取用户信息"""
         if not await self._check_admin(bot, message):
             return
         logger.info("获取用户信息1111")
-        # 获取用户信息
-        user_name = await bot.get_chatroom_user_name(message["FromWxid"], message["SenderWxid"])
+        # 获取用户信息与群信息
+        user_name, chatroom_name = await asyncio.gather(
+            self._get_member_name(bot, message["FromWxid"], message["SenderWxid"]),
+            self._get_chatroom_nickname(bot, message["FromWxid"])
+        )
         logger.info(f"user_name -> {user_name}")
-        # 获取群信息
-        chatroom_name = await bot.get_chatroom_nickname(message["FromWxid"])
 
         msg = f"用户名: {user_name}\n群聊名: {chatroom_name}"
 
@@ -118,9 +362,9 @@ class GoodMorning(PluginBase):
         chatroom_wxid = message["FromWxid"]
         # chatroom_info = await bot.get_chatroom_info(message['FromWxid'])
         # chatroom_nickname = chatroom_info.get("NickName").get("string")
-        chatroom_nickname = await bot.get_chatroom_nickname(chatroom_wxid)
+        chatroom_nickname = await self._get_chatroom_nickname(bot, chatroom_wxid)
         logger.info(f"msg --> {chatroom_nickname}")
-        ok = self.db.add_blacklist(chatroom_wxid=chatroom_wxid,chatroom_nickname=chatroom_nickname)
+        ok = await self._get_db().async_add_blacklist(chatroom_wxid=chatroom_wxid,chatroom_nickname=chatroom_nickname)
         
         msg = "设置成功" if ok else "设置失败"
         logger.info(f"msg --> {msg}")
@@ -129,59 +373,114 @@ class GoodMorning(PluginBase):
         else:
             await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
 
-    async def blacklist_get(self, bot: WechatAPIClient, message: dict):
+    async def blacklist_get(self, bot: WechatAPIClient, message: dict, arg: str = ""):
         if not await self._check_admin(bot, message):
             return
-        blacklist_list = self.db.get_blacklist()
+        total = await self._get_db().async_count_blacklist()
 
-        if len(blacklist_list) == 0:
+        if total == 0:
             await bot.send_at_message(message["FromWxid"], "\n黑名单为空", [message["SenderWxid"]])
             return
 
         await self._send_paginated_list(
             bot=bot,
             message=message,
-            items=blacklist_list,
+            total=total,
+            fetch_page=self._get_db().async_get_blacklist_page,
             title="禁用早晨问候语群列表",
-            item_formatter=lambda i, item: f"{i}. {item.get('chatroom_nickname')}"
+            item_formatter=lambda i, item: f"{i}. {item.chatroom_nickname}",
+            command=self.blacklist_command_get[0],
+            arg=arg
         )
 
-    async def _send_paginated_list(self, bot: WechatAPIClient, message: dict, items: list, title: str, item_formatter, page_size: int = 10):
+    async def _send_paginated_list(self, bot: WechatAPIClient, message: dict, total: int, fetch_page, title: str,
+                                   item_formatter, command: str, arg: str = ""):
         """
-        分页发送列表数据
+        分页发送列表数据，每页按 list_reply_max_bytes 尽量装满，只从数据库读取要显示的页（键集分页）
+        默认只发送第一页，"指令 页码" 查看指定页，"指令 全部" 在后台依次发送所有页
         Args:
             bot: 机器人实例
             message: 消息字典
-            items: 要显示的列表数据
+            total: 总条数（COUNT），显示在标题中
+            fetch_page: fetch_page(limit, after) -> [(游标, 记录)]，按游标继续读取
             title: 标题
             item_formatter: 格式化每一项的函数
-            page_size: 每页显示数量，默认10条
+            command: 查看列表的指令，用于提示翻页
+            arg: 指令参数（页码或"全部"）
         """
-        total_pages = (len(items) + page_size - 1) // page_size  # 向上取整得到总页数
-        
-        for page in range(total_pages):
-            start_idx = page * page_size
-            end_idx = min((page + 1) * page_size, len(items))
-            
-            page_info = f" (第{page + 1}/{total_pages}页)" if total_pages > 1 else ""
-            reply = [
-                f"{title} {page_info}\n",
-                "序号. 群名称",
-                "--------------------------------"
-            ]
-            
-            # 使用传入的格式化函数处理每一项
-            for i, item in enumerate(items[start_idx:end_idx], start_idx + 1):
-                reply.append(item_formatter(i, item))
-                
-            msg = "\n".join(reply)
-            logger.info(f"msg --> {msg}")
-            
-            await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
+        send_all = arg in ("全部", "all")
+        if not send_all and arg and not arg.isdigit():
+            await bot.send_at_message(message["FromWxid"], f"\n参数错误，示例：{command} 2 或 {command} 全部",
+                                      [message["SenderWxid"]])
+            return
+        page = 1 if send_all or not arg else int(arg)
+        if page < 1:
+            await bot.send_at_message(message["FromWxid"], "\n页码超出范围", [message["SenderWxid"]])
+            return
+        self._send_in_background(bot, message, self._list_replies(
+            (message["FromWxid"], command), total, fetch_page, title, item_formatter, command, page, send_all))
 
-            # 等待一段时间，避免消息过于频繁
-            await asyncio.sleep(2)
+    async def _list_replies(self, key: tuple, total: int, fetch_page, title: str, item_formatter, command: str,
+                            page: int, send_all: bool):
+        """
+        逐页生成列表回复，send_all 时生成所有页，否则只生成第 page 页
+        每页的起点按 (群, 指令) 缓存，总数不变时顺序翻页或回看每页只查询一次数据库
+        """
+        header = [f"{title} (共{total}个群{{page_info}})\n", "序号. 群名称", "--------------------------------"]
+        footer = f"发送「{command} {{next_page}}」查看下一页"
+        # 预留标题、页码与翻页提示的字节数（页码按最长 6 位计算）
+        reserved = utf8_len("\n" + "\n".join(header) + "\n" + footer) + 32
+
+        cached = self.list_cursors.get(key)
+        starts = cached[1] if cached is not None and cached[0] == total else {1: (None, 0)}
+        self.list_cursors.set(key, (total, starts))
+
+        page_no = max(p for p in starts if p <= page)
+        cursor, index = starts[page_no]
+        rows = self._iter_list_rows(fetch_page, cursor)
+        async with aclosing(paginate_rows(rows, item_formatter, self.list_reply_max_bytes, reserved, index)) as pages:
+            async for lines, next_start in pages:
+                if next_start is not None:
+                    starts[page_no + 1] = next_start
+                if send_all or page_no == page:
+                    page_info = f"，第{page_no}页" if page_no > 1 or next_start is not None else ""
+                    reply = [header[0].format(page_info=page_info), *header[1:], *lines]
+                    # 只发送单页且后面还有内容时提示翻页
+                    if not send_all and next_start is not None:
+                        reply.extend(["", footer.format(next_page=page_no + 1)])
+                    yield "\n".join(reply)
+                    if not send_all:
+                        return
+                page_no += 1
+        if not send_all:
+            yield f"页码超出范围，共 {page_no - 1} 页"
+
+    @staticmethod
+    async def _iter_list_rows(fetch_page, after: tuple = None):
+        """从游标之后每次读取 _LIST_FETCH_SIZE 条，逐条输出 (游标, 记录)"""
+        while True:
+            rows = await fetch_page(_LIST_FETCH_SIZE, after)
+            for row in rows:
+                yield row
+            if len(rows) < _LIST_FETCH_SIZE:
+                return
+            after = rows[-1][0]
 
+    def _send_in_background(self, bot: WechatAPIClient, message: dict, replies):
+        """在后台依次发送回复（异步迭代器，边生成边发送），处理函数立即返回；同一个群的发送间隔由发送队列控制"""
+        async def send_all():
+            async with aclosing(replies):
+                async for msg in replies:
+                    logger.info(f"msg --> {msg}")
+                    try:
+                        await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
+                    except Exception as e:
+                        logger.error(f"发送列表回复失败: {message['FromWxid']} {e}")
+                        return
+
+        task = asyncio.create_task(send_all())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
     async def blacklist_delete(self, bot: WechatAPIClient, message: dict):
         # 非群聊不处理
@@ -191,7 +490,7 @@ class GoodMorning(PluginBase):
             return
 
         chatroom_wxid = message["FromWxid"]
-        ok = self.db.remove_blacklist(chatroom_wxid=chatroom_wxid)
+        ok = await self._get_db().async_remove_blacklist(chatroom_wxid=chatroom_wxid)
         msg = "删除成功" if ok else "删除失败"
         if ok:
             await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
@@ -209,32 +508,41 @@ class GoodMorning(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n请输入城市", [message["SenderWxid"]])
             return
 
+        # 别名、带“市”或拼音的写法统一成规范城市名，词典中没有的区县等按原文保存
+        city = normalize_city(city)
+        if city is None:
+            await bot.send_at_message(message["FromWxid"], "\n请输入城市", [message["SenderWxid"]])
+            return
+
         chatroom_wxid = message["FromWxid"]
         # chatroom_info = await bot.get_chatroom_info(message['FromWxid'])
         # chatroom_nickname = chatroom_info.get("NickName").get("string")
-        chatroom_nickname = await bot.get_chatroom_nickname(chatroom_wxid)
+        chatroom_nickname = await self._get_chatroom_nickname(bot, chatroom_wxid)
         logger.info(f"msg --> {chatroom_nickname}")
 
-        ok = self.db.add_weather(chatroom_wxid=chatroom_wxid, chatroom_nickname=chatroom_nickname,city=city)
+        ok = await self._get_db().async_add_weather(chatroom_wxid=chatroom_wxid, chatroom_nickname=chatroom_nickname,city=city)
         msg = "设置成功" if ok else "设置失败"
         if ok:
             await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
 
-    async def weather_get(self, bot: WechatAPIClient, message: dict):
+    async def weather_get(self, bot: WechatAPIClient, message: dict, arg: str = ""):
         if not await self._check_admin(bot, message):
             return
-        weathers = self.db.get_weather()
+        total = await self._get_db().async_count_weather()
 
-        if len(weathers) == 0:
+        if total == 0:
             await bot.send_at_message(message["FromWxid"], "\n天气列表为空", [message["SenderWxid"]])
             return
 
         await self._send_paginated_list(
             bot=bot,
             message=message,
-            items=weathers,
+            total=total,
+            fetch_page=self._get_db().async_get_weather_page,
             title="天气列表",
-            item_formatter=lambda i, item: f"{i}. {item.get('chatroom_nickname')} {item.get('city')}"
+            item_formatter=lambda i, item: f"{i}. {item.chatroom_nickname} {item.city}",
+            command=self.weather_command_get[0],
+            arg=arg
         )
         
     async def weather_delete(self, bot: WechatAPIClient, message: dict):
@@ -244,11 +552,168 @@ class GoodMorning(PluginBase):
         if not await self._check_admin(bot, message):
             return
 
-        ok = self.db.remove_weather(chatroom_wxid=message["FromWxid"])
+        ok = await self._get_db().async_remove_weather(chatroom_wxid=message["FromWxid"])
         msg = "删除成功" if ok else "删除失败"
         if ok:
             await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
 
+    # MARK: - 批量管理
+    async def blacklist_bulk_set(self, bot: WechatAPIClient, message: dict, arg: str):
+        """
+        批量设置黑名单
+        格式: 批量禁用早晨问候语 <群wxid或群名通配符> ...
+        """
+        if not await self._check_admin(bot, message):
+            return
+
+        targets = arg.split()
+        if not targets:
+            await bot.send_at_message(message["FromWxid"], "\n请输入群wxid或群名", [message["SenderWxid"]])
+            return
+
+        resolved, unmatched = await self._resolve_chatrooms(bot, targets)
+        ok = await self._get_db().async_add_blacklist_bulk(list(resolved.items()))
+        await self._reply_bulk_summary(bot, message, "禁用早晨问候语", ok, len(resolved), unmatched)
+
+    async def weather_bulk_set(self, bot: WechatAPIClient, message: dict, arg: str):
+        """
+        批量设置天气城市
+        格式: 批量修改城市天为 <城市> <群wxid或群名通配符> ...
+        """
+        if not await self._check_admin(bot, message):
+            return
+
+        parts = arg.split()
+        if len(parts) < 2:
+            await bot.send_at_message(message["FromWxid"], "\n请输入城市和群wxid或群名", [message["SenderWxid"]])
+            return
+
+        city, targets = normalize_city(parts[0]), parts[1:]
+        resolved, unmatched = await self._resolve_chatrooms(bot, targets)
+        ok = await self._get_db().async_add_weather_bulk([(wxid, nickname, city) for wxid, nickname in resolved.items()])
+        await self._reply_bulk_summary(bot, message, f"设置城市为{city}", ok, len(resolved), unmatched)
+
+    async def bulk_import(self, bot: WechatAPIClient, message: dict):
+        """
+        从 bulk_import_file 批量导入黑名单与天气城市，文件格式：
+            blacklist = ["xxx@chatroom", "*测试*"]
+            [weather]
+            "重庆" = ["*重庆*", "yyy@chatroom"]
+        """
+        if not await self._check_admin(bot, message):
+            return
+
+        if not os.path.exists(self.bulk_import_file):
+            await bot.send_at_message(message["FromWxid"], f"\n导入文件不存在: {self.bulk_import_file}",
+                                      [message["SenderWxid"]])
+            return
+
+        try:
+            with open(self.bulk_import_file, "rb") as f:
+                data = tomllib.load(f)
+        except Exception as e:
+            logger.error(f"读取导入文件失败: {e}")
+            await bot.send_at_message(message["FromWxid"], f"\n导入文件格式错误: {e}", [message["SenderWxid"]])
+            return
+
+        weather_targets, empty_cities = {}, 0
+        for city, targets in data.get("weather", {}).items():
+            normalized = normalize_city(city)
+            if normalized is None:
+                empty_cities += 1
+            else:
+                weather_targets.setdefault(normalized, []).extend(targets)
+        all_targets = list(data.get("blacklist", []))
+        for targets in weather_targets.values():
+            all_targets.extend(targets)
+        # 所有模式只解析一次
+        resolved_all, unmatched = await self._resolve_chatrooms(bot, all_targets)
+
+        blacklist_rows, _ = await self._resolve_chatrooms(bot, data.get("blacklist", []), resolved_all)
+        weather_rows = {}
+        for city, targets in weather_targets.items():
+            resolved, _ = await self._resolve_chatrooms(bot, targets, resolved_all)
+            for wxid, nickname in resolved.items():
+                weather_rows[wxid] = (wxid, nickname, city)
+
+        ok = await self._get_db().async_import_bulk(list(blacklist_rows.items()), list(weather_rows.values()))
+
+        msg = (
+            f"导入{'成功' if ok else '失败'}\n"
+            f"黑名单: {len(blacklist_rows)} 个群\n"
+            f"天气: {len(weather_rows)} 个群"
+        )
+        if unmatched:
+            msg += f"\n未匹配: {'、'.join(unmatched)}"
+        if empty_cities:
+            msg += f"\n忽略城市为空的设置: {empty_cities} 项"
+        await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
+
+    async def _resolve_chatrooms(self, bot: WechatAPIClient, targets: list, known: dict = None):
+        """
+        将群wxid或群名通配符解析为 {群wxid: 群昵称}
+        known 为已解析过的群昵称，提供时不再请求接口
+        返回 (已解析, 未匹配的输入)
+        """
+        wxids = [x for x in targets if x.endswith("@chatroom")]
+        patterns = [x for x in targets if not x.endswith("@chatroom")]
+
+        if known is None:
+            candidates = list(wxids)
+            if patterns:
+                cached = await self._get_db().async_get_cached_chatrooms()
+                candidates.extend(cached or await self._get_chatrooms(bot))
+            known = await self._get_chatroom_nicknames(bot, candidates)
+
+        resolved = {wxid: known.get(wxid, "") for wxid in wxids}
+        unmatched = []
+        for pattern in patterns:
+            # 不带通配符时按包含匹配
+            glob = pattern if any(c in pattern for c in "*?[") else f"*{pattern}*"
+            matched = {wxid: nickname for wxid, nickname in known.items()
+                       if nickname and fnmatch.fnmatchcase(nickname, glob)}
+            if not matched:
+                unmatched.append(pattern)
+            resolved.update(matched)
+        return resolved, unmatched
+
+    async def _get_chatroom_nicknames(self, bot: WechatAPIClient, chatrooms: list) -> dict:
+        """并发获取群昵称，返回 {群wxid: 群昵称}"""
+        chatrooms = list(dict.fromkeys(chatrooms))
+        semaphore = asyncio.Semaphore(10)
+
+        async def fetch(chatroom):
+            async with semaphore:
+                try:
+                    return await self._get_chatroom_nickname(bot, chatroom)
+                except Exception as e:
+                    logger.error(f"获取群昵称失败: {chatroom} {e}")
+                    return ""
+
+        nicknames = await asyncio.gather(*(fetch(chatroom) for chatroom in chatrooms))
+        return dict(zip(chatrooms, nicknames))
+
+    async def _get_chatroom_nickname(self, bot: WechatAPIClient, chatroom_wxid: str) -> str:
+        """获取群昵称（带缓存，并发请求合并）"""
+        return await self.name_cache.get_or_load(
+            ("chatroom", chatroom_wxid),
+            lambda: bot.get_chatroom_nickname(chatroom_wxid)
+        )
+
+    async def _get_member_name(self, bot: WechatAPIClient, chatroom_wxid: str, wxid: str) -> str:
+        """获取群成员昵称（带缓存，并发请求合并）"""
+        return await self.name_cache.get_or_load(
+            ("member", chatroom_wxid, wxid),
+            lambda: bot.get_chatroom_user_name(chatroom_wxid, wxid)
+        )
+
+    async def _reply_bulk_summary(self, bot: WechatAPIClient, message: dict, action: str, ok: bool,
+                                  count: int, unmatched: list):
+        msg = f"{action}{'成功' if ok else '失败'}: {count} 个群"
+        if unmatched:
+            msg += f"\n未匹配: {'、'.join(unmatched)}"
+        await bot.send_at_message(message["FromWxid"], "\n" + msg, [message["SenderWxid"]])
+
     async def _check_admin(self, bot: WechatAPIClient, message: dict) -> bool:
         """检查是否是管理员"""
         sender_wxid = message["SenderWxid"]
@@ -263,176 +728,396 @@ class GoodMorning(PluginBase):
     # MARK: - 定时任务
     @schedule('cron', day_of_week='mon-fri', hour=7, minute=0)
     async def daily_task(self, bot: WechatAPIClient):
+        self.reload_config()
         if not self.enable:
             return
 
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
-        
-        # chatrooms = ["58405787667@chatroom", "53166638591@chatroom"]
+        bot = self._outbound_bot(bot, PRIORITY_BULK)
+        try:
+            with self.metrics.span("daily_task"):
+                await self._daily_task(bot)
+        finally:
+            self.export_metrics()
 
-        # 黑名单处理
-        blacklist_list = [str(item.get("chatroom_wxid")) for item in self.db.get_blacklist()]
-        chatrooms = [x for x in chatrooms if x not in blacklist_list]
+    async def _daily_task(self, bot: WechatAPIClient):
+        run_date = date.today().isoformat()
+        run = await self._get_db().async_get_run(run_date)
+        if run is not None and run["status"] == "done":
+            logger.info(f"今日早安广播已完成: {run_date}")
+            return
 
-        # 天气处理
-        weather_list = self.db.get_weather()
+        leases = await self._get_db().async_get_leases(run_date)
+        if self.shard_id not in leases:
+            # 先只生成消息公共部分，群聊在发送时边拉取通讯录边解析（见 _run_shard）
+            history_today = await self.get_history_today()
+            await self._get_db().async_start_run(run_date, self._build_header(history_today), [], self.shard_id,
+                                          lease_status="planning", shard_count=self.shard_count,
+                                          lease_seconds=self.shard_lease_seconds)
 
-        # 提取所有 city 字段
-        cities = [item.get("city") for item in weather_list]
-        # 添加默认城市
-        cities.append("重庆")
-        # 去重
-        unique_cities = list(set(cities))
+        await self._run_broadcast(bot, run_date)
 
-        weather_today_map = {}
-        # 遍历城市列表
-        for city in unique_cities:
-            weather_today = await self.get_weather(city)
-            weather_today_map[city] = weather_today
+    async def resume_daily_task(self, bot: WechatAPIClient):
+        """启动时继续发送当天未完成的早安广播"""
+        run_date = date.today().isoformat()
+        run = await self._get_db().async_get_run(run_date)
+        if run is None or run["status"] == "done":
+            return
 
-        history_today = await self.get_history_today()
+        logger.info(f"发现未完成的早安广播，继续发送: {run_date}")
+        try:
+            await self._run_broadcast(self._outbound_bot(bot, PRIORITY_BULK), run_date)
+        finally:
+            self.export_metrics()
 
+    def _build_header(self, history_today: str) -> str:
+        """生成当天消息的公共部分"""
         weekend = ["一", "二", "三", "四", "五", "六", "日"]
         message_parts = [
             f"早上好！今天是 {datetime.now().strftime('%Y年%m月%d日')}，星期{weekend[datetime.now().weekday()]}"
         ]
-        
+
         if history_today != "N/A":
             message_parts.extend([
                 "",
                 "历史上的今天：",
                 history_today
             ])
+        return "\n".join(message_parts)
 
-        for chatroom in chatrooms:
-            text_parts = message_parts.copy()
-            # 天气
-            city = "重庆"
-            for item in weather_list:
-                if item["chatroom_wxid"] == chatroom:
-                    city = item["city"]
-                    break  # 找到就退出循环
-            weather_today = weather_today_map.get(city, "N/A")
-            if weather_today!= "N/A":
-                text_parts.extend([
-                    "",
-                    weather_today
-                ])
-            
-            # 获取随机问候语
-            random_hello_text = self._random_hello_text()
-            # 插入换行
-            random_hello_text.insert(0, "")
-            # 添加到列表中
-            text_parts.extend(random_hello_text)
-            message = "\n".join(text_parts)
-
-            logger.info(f"message --> {message}")
-
-            await bot.send_text_message(chatroom, message)
-            await asyncio.sleep(randint(1, 5))
-
-    def _random_hello_text(self):
-        """随机获取问候语"""
-        return self.hello_texts[randint(0, len(self.hello_texts) - 1)].copy()
+    async def _run_broadcast(self, bot: WechatAPIClient, run_date: str):
+        """
+        发送本分片的广播，之后定期检查各分片租约：重试本分片未完成的部分，并按配置接管租约已过期的其他分片，
+        直到所有分片完成后结束当天批次，或超过 dispatch_finish_by（未配置时为当天结束）
+        开始时已经过了 dispatch_finish_by（例如重启后续发）时不再限制截止时间，剩余的群立即发送
+        """
+        async with self._broadcast_lock:
+            run = await self._get_db().async_get_run(run_date)
+            if run is None or run["status"] == "done":
+                return
 
-    async def get_history_today(self, limit_num: int = 3):
-        """获取历史上的今天数据"""
-        try:
-            async with aiohttp.request("GET", "https://v2.api-m.com/api/history", ssl=False) as req:
-                resp = await req.json()
-                history_today = "N/A"
-                if resp.get("data"):
-                    history_events = resp.get("data", [])[:limit_num]  # 只取前3条数据
-                    history_today = "\n".join([str(event) for event in history_events])
-                return history_today
-        except Exception as e:
-            logger.error(f"获取历史上的今天异常: {e}")
-            return "N/A"
+            if self.shard_count > 1:
+                # 黑名单与天气可能在其他进程中修改过，本进程的快照不会同步更新
+                try:
+                    await self._get_db().async_reload_snapshot()
+                except Exception as e:
+                    logger.error(f"重新加载黑名单与天气快照失败，使用现有快照: {e}")
 
-    async def get_weather(self, city):
-        """获取指定城市的天气数据"""
-        try:
-            url = f"https://v.api.aa1.cn/api/api-tianqi-3/index.php?msg={city}&type=1"
-            async with aiohttp.request("GET", url, ssl=False) as req:
-                resp = await req.text()
-                
-                # 提取并解析JSON数据
-                json_data = self._extract_weather_json(resp)
-                if not json_data:
-                    return "N/A"
-                
-                # 获取今天的天气数据
-                today_weather = self._get_today_weather(json_data, city)
-                return today_weather
-                
-        except Exception as e:
-            logger.error(f"获取天气异常: {e}")
-            return "N/A"
-    
-    def _extract_weather_json(self, response_text):
-        """从响应文本中提取JSON数据"""
-        import re
-        import json
-        
-        # 尝试从响应中提取JSON数据
-        json_pattern = re.compile(r'(\{\s*"code"\s*:\s*"1"[\s\S]*\})')
-        match = json_pattern.search(response_text)
-        
-        if not match:
-            logger.error("未找到天气JSON数据")
-            return None
-            
-        json_str = match.group(1)
-        logger.debug(f"提取的JSON数据长度: {len(json_str)}")
-        
+            finish_by = BroadcastDispatcher.parse_finish_by(self.dispatch_finish_by)
+            if finish_by is not None and finish_by <= datetime.now():
+                logger.warning(f"已超过截止时间 {self.dispatch_finish_by}，剩余的群立即发送")
+                finish_by = None
+
+            await self._run_shard(bot, run, self.shard_id, finish_by)
+
+            deadline = finish_by
+            if deadline is None:
+                deadline = datetime.combine(date.fromisoformat(run_date) + timedelta(days=1), datetime.min.time())
+            while True:
+                leases = await self._get_db().async_get_leases(run_date)
+                unfinished = [shard for shard in range(self.shard_count)
+                              if leases.get(shard, {}).get("status") != "done"]
+                if not unfinished:
+                    break
+                # 不接管时只重试本分片，其他分片由各自的进程完成并结束批次
+                if not self.shard_takeover and self.shard_id not in unfinished:
+                    logger.info(f"早安广播等待其他分片完成: {unfinished}")
+                    return
+                if datetime.now() >= deadline:
+                    logger.warning(f"早安广播超过截止时间仍有分片未完成: {unfinished}")
+                    return
+
+                await asyncio.sleep(self.shard_lease_seconds / 3)
+                now = datetime.now()
+                for shard_id, lease in (await self._get_db().async_get_leases(run_date)).items():
+                    if lease["status"] == "done":
+                        continue
+                    if shard_id == self.shard_id and lease["owner"] in (None, self.shard_owner):
+                        logger.info(f"分片 {shard_id} 仍有未完成的群，重试")
+                    elif self.shard_takeover and lease["expires_at"] is not None and lease["expires_at"] < now:
+                        logger.warning(f"分片 {shard_id} 的租约已过期（{lease['owner']}），尝试接管")
+                    else:
+                        continue
+                    await self._run_shard(bot, run, shard_id, finish_by)
+
+            await self._get_db().async_finish_run(run_date)
+            counts = await self._get_db().async_count_deliveries(run_date)
+            if counts.get("sending"):
+                logger.warning(f"{counts['sending']} 个群在上次中断时处于发送中，状态未知，不再重发")
+
+    async def _run_shard(self, bot: WechatAPIClient, run: dict, shard_id: int, finish_by: datetime = None):
+        """
+        持有租约发送某个分片的广播，每个 (日期, 群) 只发送一次
+        计划尚未生成完时按流水线 通讯录分页 -> 解析计划 -> 渲染 -> 发送 边拉取边发送，否则发送剩余的待发送记录
+        """
+        run_date = run["run_date"]
+        if not await self._get_db().async_acquire_lease(run_date, shard_id, self.shard_owner, self.shard_lease_seconds):
+            logger.info(f"分片 {shard_id} 由其他进程持有或尚未生成计划，跳过")
+            return
+
+        async def renew():
+            while True:
+                await asyncio.sleep(self.shard_lease_seconds / 3)
+                if not await self._get_db().async_acquire_lease(run_date, shard_id, self.shard_owner,
+                                                         self.shard_lease_seconds):
+                    logger.warning(f"分片 {shard_id} 租约续约失败")
+
+        renew_task = asyncio.create_task(renew())
         try:
-            return json.loads(json_str)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON解析错误: {e}")
-            return None
-    
-    def _get_today_weather(self, weather_data, city):
-        """从天气数据中获取今天的天气信息"""
-        if not weather_data or weather_data.get("code") != "1" or not weather_data.get("data"):
-            return "N/A"
-            
-        # 获取当前星期几
-        current_weekday = datetime.now().weekday()  # 0-6 对应周一到周日
-        weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        current_weekday_name = weekday_names[current_weekday]
-        
-        # 查找匹配当前星期的天气数据
-        today = None
-        for day_data in weather_data["data"]:
-            if day_data.get("riqi") == current_weekday_name:
-                today = day_data
-                break
-        
-        if not today:
-            return "N/A"
-            
-        # 格式化天气信息
-        return (
-            f"{city}今日天气：\n"
-            f"温度：{today.get('wendu', '未知')}\n"
-            f"天气：{today.get('tianqi', '未知')}\n"
-            # f"风力：{today.get('fengdu', '未知')}\n"
-            f"空气质量：{today.get('pm', '未知')}"
+            lease = (await self._get_db().async_get_leases(run_date)).get(shard_id, {})
+            if lease.get("status") == "planning":
+                # 首次运行或上次在拉取通讯录时中断：重新拉取，已发送过的群认领失败，不会重发
+                batches = self._plan_batches(bot, run_date, shard_id)
+            else:
+                batches = self._pending_batches(run_date, shard_id)
+
+            # 每个 (城市, 问候语) 组合只渲染一次，各群共享同一个字符串
+            template = GreetingTemplate([run["header"]], {}, self.hello_texts)
+
+            claim_errors = 0
+
+            async def send(chatroom: str, message: str):
+                nonlocal claim_errors
+                # 先认领再发送，认领失败说明已发送或正在发送；认领出错计为失败，记录保持 pending 留待重试
+                try:
+                    claimed = await self._get_db().async_claim_delivery(run_date, chatroom)
+                except Exception:
+                    claim_errors += 1
+                    raise
+                if not claimed:
+                    return False
+                try:
+                    await bot.send_text_message(chatroom, message)
+                except Exception:
+                    await self._get_db().async_finish_delivery(run_date, chatroom, "failed")
+                    raise
+                await self._get_db().async_finish_delivery(run_date, chatroom, "sent")
+
+            # 并发限速发送，目标边生成边发送
+            dispatcher = BroadcastDispatcher(
+                concurrency=self.dispatch_concurrency,
+                rate=self.dispatch_rate,
+                burst=self.dispatch_burst,
+                jitter=self.dispatch_jitter,
+                finish_by=finish_by
+            )
+            try:
+                with self.metrics.span("dispatch"):
+                    stats = await dispatcher.dispatch(self._render_targets(template, batches), send)
+            except Exception as e:
+                # 租约到期后由其他进程接管，或重启后继续
+                logger.error(f"分片 {shard_id} 生成发送计划失败，已发送的群不受影响: {e!r}")
+                return
+            for status in ("sent", "failed", "skipped", "duplicated"):
+                self.metrics.inc(BROADCAST_TOTAL, getattr(stats, status), status=status)
+            if claim_errors:
+                # 不结束分片，租约到期后重试（接管或重启后继续）
+                logger.error(f"分片 {shard_id} 有 {claim_errors} 个群认领失败，仍待发送: {stats.summary()}")
+                return
+            await self._get_db().async_finish_lease(run_date, shard_id, self.shard_owner)
+            logger.info(f"早安广播完成 -> 分片 {shard_id}, {len(template)} 种消息, {stats.summary()}")
+            logger.info(f"发送队列: {self.outbound.stats.summary()}")
+        finally:
+            renew_task.cancel()
+
+    # MARK: - 发送流水线
+    async def _iter_chatroom_pages(self, bot: WechatAPIClient):
+        """
+        流水线第一段：按页输出群聊wxid（只保留 @chatroom，个人联系人不保留）
+        平时先输出缓存的群，再从上次的 seq 开始拉取增量；每隔 contact_full_resync_days 天全量同步一次
+        """
+        sync_time = datetime.now()
+        state = await self._get_db().async_get_contact_state()
+        full = (
+            state is None
+            or state["last_full_sync"] is None
+            or sync_time - state["last_full_sync"] >= timedelta(days=self.contact_full_resync_days)
         )
+        wx_seq, chatroom_seq = (0, 0) if full else (state["wx_seq"], state["chatroom_seq"])
+
+        if not full:
+            cached = await self._get_db().async_get_cached_chatrooms()
+            for start in range(0, len(cached), _CACHED_PAGE_SIZE):
+                yield cached[start:start + _CACHED_PAGE_SIZE]
+
+        while True:
+            with self.metrics.span("contacts"):
+                contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
+            chatrooms = [x for x in contact_list["ContactUsernameList"] if x.endswith("@chatroom")]
+            if chatrooms:
+                await self._get_db().async_save_contact_page(chatrooms, sync_time)
+                yield chatrooms
+            wx_seq = contact_list["CurrentWxcontactSeq"]
+            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
+            if contact_list["CountinueFlag"] != 1:
+                break
+
+        await self._get_db().async_save_contact_state(wx_seq, chatroom_seq, full, sync_time)
+
+    async def _plan_batches(self, bot: WechatAPIClient, run_date: str, shard_id: int):
+        """
+        流水线第二段：去重、按分片过滤、剔除黑名单并确定城市，保存投递记录后按页输出 [(群, 城市, 问候语序号)]
+        通讯录分页在后台提前读取 pipeline_buffer_pages 页
+        """
+        seen = set()
+        async for page in buffered(self._iter_chatroom_pages(bot), self.pipeline_buffer_pages):
+            chatrooms = [
+                x for x in page
+                if x not in seen and (self.shard_count == 1 or self.shard_ring.shard_of(x) == shard_id)
+            ]
+            seen.update(chatrooms)
+            if not chatrooms:
+                continue
+
+            with self.metrics.span("plan"):
+                plan = await self._get_db().async_get_target_plan(chatrooms, DEFAULT_CITY)
+            deliveries = [(chatroom, city, randrange(len(self.hello_texts))) for chatroom, city in plan]
+            # 先保存再发送，发送时按投递记录认领
+            if deliveries and not await self._get_db().async_add_deliveries(run_date, deliveries, shard_id):
+                raise RuntimeError(f"保存投递记录失败: {run_date} 分片 {shard_id}")
+            yield deliveries
+
+        # 计划已完整保存，之后中断只需发送剩余的待发送记录
+        await self._get_db().async_set_lease_status(run_date, shard_id, self.shard_owner, "running")
+        logger.info(f"早安广播计划已生成: 分片 {shard_id}, {len(seen)} 个群")
+
+    async def _pending_batches(self, run_date: str, shard_id: int):
+        """计划已完整保存时，一次性输出剩余的待发送记录"""
+        yield await self._get_db().async_get_pending_deliveries(run_date, shard_id)
+
+    async def _render_targets(self, template: GreetingTemplate, batches):
+        """流水线第三段：补齐本批新出现城市的天气，渲染消息后逐条输出 (群, 消息)"""
+        async for deliveries in batches:
+            missing = {city for _, city, _ in deliveries if city not in template.weather_map}
+            if missing:
+                # 天气已在 6:45 预热，正常情况下只读缓存
+                template.weather_map.update(await self.fetch_weathers(missing))
+
+            with self.metrics.span("render"):
+                targets = []
+                for chatroom, city, hello_index in deliveries:
+                    message = template.render(city, hello_index % len(self.hello_texts))
+                    if self.message_log_sample_rate and random() < self.message_log_sample_rate:
+                        logger.info(f"message --> {chatroom}\n{message}")
+                    targets.append((chatroom, message))
+            for target in targets:
+                yield target
+
+    async def _get_chatrooms(self, bot: WechatAPIClient) -> list:
+        """获取所有群聊wxid（批量管理按群名匹配时使用）"""
+        chatrooms = []
+        async for page in self._iter_chatroom_pages(bot):
+            chatrooms.extend(page)
+        return list(dict.fromkeys(chatrooms))
+
+    @schedule('cron', day_of_week='mon-fri', hour=6, minute=45)
+    async def prewarm_task(self, bot: WechatAPIClient):
+        """预热天气缓存，7:00 广播时直接读内存"""
+        self.reload_config()
+        if not self.enable:
+            return
+
+        cities = [item.city for item in await self._get_db().async_get_weather()]
+        cities.append(DEFAULT_CITY)
+        weather_map = await self.fetch_weathers(cities)
+        failed = [city for city, weather in weather_map.items() if weather == "N/A"]
+        logger.info(f"天气缓存预热完成: {len(weather_map)} 个城市, 失败: {failed}")
+        self.weather_cache.save_snapshot()
+
+    @schedule('cron', minute=5)
+    async def history_fill_task(self, bot: WechatAPIClient):
+        """每小时检查一次历史上的今天存储，缺少或过期的日期提前获取"""
+        self.reload_config()
+        if not self.enable:
+            return
+        await self.fill_history()
+
+    async def fill_history(self):
+        """
+        填充今天起 history_prefetch_days 天的历史上的今天
+        只能获取当天的数据源（接口地址不带日期）每天第一次运行时获取当天；
+        已保存超过 history_refresh_days 天的记录重新获取，失败的日期下次运行时重试
+        """
+        today = date.today()
+        days = [today + timedelta(days=offset) for offset in range(max(int(self.history_prefetch_days), 1))]
+        days = [day for day in days if self.history_providers.can_fetch_history(day)]
+        if not days:
+            return
+
+        update_times = await self._get_db().async_get_history_update_times([day.strftime("%m-%d") for day in days])
+        stale_before = datetime.now() - timedelta(days=self.history_refresh_days)
+        filled, failed = [], []
+        for day in days:
+            month_day = day.strftime("%m-%d")
+            update_time = update_times.get(month_day)
+            if update_time is not None and update_time >= stale_before:
+                continue
+            # 逐天请求，不给上游造成突发压力
+            events = await self.history_providers.fetch_history(day)
+            if events and await self._get_db().async_save_history(month_day, events):
+                filled.append(month_day)
+            else:
+                failed.append(month_day)
+        if filled or failed:
+            logger.info(f"历史上的今天填充完成: {filled}, 失败: {failed}")
+
+    async def get_history_today(self, limit_num: int = 3):
+        """
+        获取历史上的今天数据，读本地存储（由 history_fill_task 提前填充）
+        存储中还没有今天的记录时（例如插件刚启用）实时请求一次并保存
+        """
+        today = date.today()
+        with self.metrics.span("history"):
+            events = await self._get_db().async_get_history(today.strftime("%m-%d"))
+            if events is None:
+                logger.warning("历史上的今天尚未填充，实时请求")
+                events = await self.history_providers.fetch_history(today)
+                if events:
+                    await self._get_db().async_save_history(today.strftime("%m-%d"), events)
+        self.metrics.inc(HISTORY_TOTAL, result="ok" if events else "na")
+        return "\n".join(events[:limit_num]) if events else "N/A"
+
+    async def fetch_weathers(self, cities) -> dict:
+        """获取多个城市的天气，优先读缓存，未命中的并发请求，返回 {城市: 天气}"""
+        weather_map = {}
+        missing = []
+        for city in dict.fromkeys(cities):
+            weather = self.weather_cache.get(city)
+            if weather is None:
+                missing.append(city)
+            else:
+                weather_map[city] = weather
+
+        if missing:
+            logger.info(f"天气缓存未命中，请求接口: {missing}")
+            with self.metrics.span("weather"):
+                results = await self.weather_providers.fetch_weathers(missing)
+            for city, weather in results.items():
+                weather_map[city] = weather
+                if weather != "N/A":
+                    self.weather_cache.set(city, weather)
+                self.metrics.inc(WEATHER_TOTAL, result="na" if weather == "N/A" else "ok")
+        return weather_map
+
+    # MARK: - 发送与指标
+    def _outbound_bot(self, bot: WechatAPIClient, priority: int):
+        """
+        返回 send_* 经过发送队列（按 priority 排队）并计时的 bot 代理，同一个 bot 复用同一组代理
+        """
+        if self._bot_proxies is None or self._bot_proxies[0] is not bot:
+            instrumented = InstrumentedBot(bot, self.metrics)
+            self._bot_proxies = (bot, {
+                level: QueuedBot(instrumented, self.outbound, level) for level in (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+            })
+        return self._bot_proxies[1][priority]
+
+    def export_metrics(self):
+        """按配置写出 Prometheus 文本与 JSON 指标文件"""
+        if self.metrics_prometheus_file or self.metrics_json_file:
+            self.metrics.export(self.metrics_prometheus_file, self.metrics_json_file)
+
+    @schedule('interval', minutes=1)
+    async def metrics_task(self, bot: WechatAPIClient):
+        self.export_metrics()
 
     # @schedule('interval', seconds=10)
     async def daily_taskkkk(self, bot: WechatAPIClient):
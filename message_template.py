@@ -0,0 +1,29 @@
+class GreetingTemplate:
+    """
+    早安消息模板
+    公共部分（日期、历史上的今天）只拼接一次，每个 (城市, 问候语) 组合只渲染一次，
+    各群拿到的是同一个字符串的引用
+    """
+
+    def __init__(self, header_parts: list, weather_map: dict, hello_texts: list):
+        self.header = "\n".join(header_parts)
+        self.weather_map = weather_map
+        self.hello_texts = ["\n".join(lines) for lines in hello_texts]
+        self._rendered = {}
+
+    def render(self, city: str, hello_index: int) -> str:
+        """渲染指定城市与问候语的消息"""
+        key = (city, hello_index)
+        message = self._rendered.get(key)
+        if message is None:
+            parts = [self.header]
+            weather_today = self.weather_map.get(city, "N/A")
+            if weather_today != "N/A":
+                parts.append(weather_today)
+            parts.append(self.hello_texts[hello_index])
+            message = "\n\n".join(parts)
+            self._rendered[key] = message
+        return message
+
+    def __len__(self):
+        return len(self._rendered)
@@ -0,0 +1,219 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from loguru import logger
+
+# 指标名称
+SPAN_SECONDS = "goodmorning_span_seconds"
+DB_SECONDS = "goodmorning_db_seconds"
+DB_WAIT_SECONDS = "goodmorning_db_wait_seconds"
+SEND_SECONDS = "goodmorning_send_seconds"
+SEND_TOTAL = "goodmorning_send_total"
+BROADCAST_TOTAL = "goodmorning_broadcast_total"
+WEATHER_TOTAL = "goodmorning_weather_total"
+HISTORY_TOTAL = "goodmorning_history_total"
+OUTBOUND_DEPTH = "goodmorning_outbound_depth"
+OUTBOUND_WAIT_SECONDS = "goodmorning_outbound_wait_seconds"
+
+_HELP = {
+    SPAN_SECONDS: "早安任务各阶段耗时",
+    DB_SECONDS: "GoodMorningDB 方法耗时（在数据库线程中的执行时间）",
+    DB_WAIT_SECONDS: "GoodMorningDB 方法在数据库线程前的排队时间",
+    SEND_SECONDS: "bot.send_* 调用耗时",
+    SEND_TOTAL: "bot.send_* 调用次数，result=ok/error",
+    BROADCAST_TOTAL: "早安广播结果，status=sent/failed/skipped/duplicated",
+    WEATHER_TOTAL: "天气接口结果，result=ok/na（N/A 兜底）",
+    HISTORY_TOTAL: "历史上的今天接口结果，result=ok/na",
+    OUTBOUND_DEPTH: "发送队列中等待的消息数",
+    OUTBOUND_WAIT_SECONDS: "消息在发送队列中的等待时间",
+}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metrics:
+    """
+    进程内计数器、仪表与直方图
+    只在事件循环线程中更新，不加锁；超过阈值的耗时写入慢操作日志
+    slow_thresholds: {指标名: 秒}，未配置的指标不记录慢操作
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.slow_thresholds = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """计数器加 value"""
+        series = self._counters.setdefault(name, {})
+        key = _label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置仪表的当前值"""
+        self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """记录一次耗时"""
+        series = self._histograms.setdefault(name, {})
+        key = _label_key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            # [各桶计数（非累计）, 总和, 次数]
+            histogram = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        histogram[0][bisect_left(self.buckets, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+        threshold = self.slow_thresholds.get(name)
+        if threshold is not None and seconds >= threshold:
+            logger.warning(f"慢操作: {name}{_format_labels(key)} 耗时 {seconds:.3f}s（阈值 {threshold}s）")
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """记录代码块耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def span(self, span: str):
+        """早安任务阶段耗时"""
+        return self.timer(SPAN_SECONDS, span=span)
+
+    def counter_value(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def ratio(self, name: str, **labels) -> float:
+        """计数器中指定标签占该指标总数的比例，例如天气 N/A 率"""
+        total = sum(self._counters.get(name, {}).values())
+        return self.counter_value(name, **labels) / total if total else 0.0
+
+    # MARK: - 导出
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式（可交给 node_exporter 的 textfile collector 采集）"""
+        lines = []
+        for name, series in sorted(self._counters.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self._gauges.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self._histograms.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, (counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict:
+        counters = {
+            name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+            for name, series in sorted(self._counters.items())
+        }
+        gauges = {
+            name: [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+            for name, series in sorted(self._gauges.items())
+        }
+        histograms = {
+            name: [
+                {
+                    "labels": dict(key),
+                    "count": count,
+                    "sum": round(total, 6),
+                    "avg": round(total / count, 6) if count else 0.0,
+                    "buckets": {str(bound): c for bound, c in zip(self.buckets + ("+Inf",), counts)},
+                }
+                for key, (counts, total, count) in sorted(series.items())
+            ]
+            for name, series in sorted(self._histograms.items())
+        }
+        return {
+            "time": time.time(),
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+            "weather_na_rate": round(self.ratio(WEATHER_TOTAL, result="na"), 4),
+            "send_error_rate": round(self.ratio(SEND_TOTAL, result="error"), 4),
+        }
+
+    def export(self, prometheus_path: str = "", json_path: str = ""):
+        """写入指标文件，先写临时文件再替换，采集方不会读到半个文件"""
+        for path, content in ((prometheus_path, self.to_prometheus),
+                              (json_path, lambda: json.dumps(self.to_dict(), ensure_ascii=False, indent=2))):
+            if not path:
+                continue
+            try:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(content())
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.error(f"写入指标文件失败: {path} {e}")
+
+
+class InstrumentedBot:
+    """
+    为 bot 的 send_* 方法计时与计数的代理，其余属性原样转发
+    """
+
+    def __init__(self, bot, metrics: Metrics):
+        self._bot = bot
+        self._metrics = metrics
+        self._wrapped = {}
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._bot, name)
+        if not name.startswith("send_") or not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            metrics = self._metrics
+
+            async def wrapped(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await attr(*args, **kwargs)
+                except Exception:
+                    metrics.inc(SEND_TOTAL, method=name, result="error")
+                    raise
+                finally:
+                    metrics.observe(SEND_SECONDS, time.perf_counter() - started, method=name)
+                metrics.inc(SEND_TOTAL, method=name, result="ok")
+                return result
+
+            self._wrapped[name] = wrapped
+        return wrapped
+
+
+# 插件内共享的指标
+METRICS = Metrics()
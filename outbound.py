@@ -0,0 +1,219 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from plugins.GoodMorning.dispatcher import TokenBucket
+from plugins.GoodMorning.metrics import OUTBOUND_DEPTH, OUTBOUND_WAIT_SECONDS, Metrics
+
+# 优先级，数字越小越先发送
+PRIORITY_INTERACTIVE = 0  # 指令回复、列表等交互消息
+PRIORITY_BULK = 1  # 早安广播
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BULK: "bulk"}
+
+
+class _Outbound:
+    __slots__ = ("chatroom", "send", "priority", "future", "enqueued")
+
+    def __init__(self, chatroom: str, send: Callable[[], Awaitable], priority: int, future: asyncio.Future):
+        self.chatroom = chatroom
+        self.send = send
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class OutboundStats:
+    """发送队列统计，等待时间只保留最近 window 条"""
+
+    def __init__(self, window: int = 1000):
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.waits = deque(maxlen=window)
+
+    def percentile(self, p: float) -> float:
+        """按最近秩法计算排队等待时间分位数（秒）"""
+        if not self.waits:
+            return 0.0
+        ordered = sorted(self.waits)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def summary(self) -> str:
+        return (
+            f"提交: {self.submitted}, 成功: {self.sent}, 失败: {self.failed}, "
+            f"队列深度: {self.depth}（最大 {self.max_depth}）, "
+            f"等待 p50: {self.percentile(50) * 1000:.0f}ms, p95: {self.percentile(95) * 1000:.0f}ms"
+        )
+
+
+class OutboundQueue:
+    """
+    插件级发送队列
+    交互回复先于早安广播发送，同一优先级先进先出；
+    全局令牌桶限制整个账号的发送速率，同一个群相邻两条消息至少间隔 chat_interval 秒；
+    每个优先级最多排队 max_size 条，队列满时 submit 等待（背压）
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 5, chat_interval: float = 1.0, max_size: int = 100,
+                 workers: int = 5, metrics: Optional[Metrics] = None):
+        self.rate = rate
+        self.burst = burst
+        self.chat_interval = float(chat_interval)
+        self.max_size = max(int(max_size), 1)
+        self.workers = max(int(workers), 1)
+        self.metrics = metrics
+        self.stats = OutboundStats()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._slots = {}
+        self._depths = {}
+        self._next_allowed = {}
+        self._seq = 0
+        self._tasks = []
+        # 因单群限速延后放回队列的消息：顺序号 -> (定时器, 消息)
+        self._deferred = {}
+
+    def _ensure_started(self):
+        # 第一次提交时才创建，保证与调用方在同一个事件循环中
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._bucket = TokenBucket(self.rate, self.burst)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """停止发送，尚未发送的消息（包括正在发送和延后放回的）以 CancelledError 结束"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for handle, item in self._deferred.values():
+            handle.cancel()
+            item.future.cancel()
+            self._release(item)
+        self._deferred.clear()
+        while self._queue is not None and not self._queue.empty():
+            _, _, item = self._queue.get_nowait()
+            item.future.cancel()
+            self._release(item)
+
+    async def submit(self, priority: int, chatroom: str, send: Callable[[], Awaitable]) -> asyncio.Future:
+        """
+        提交一条消息，队列满时等待，返回发送结果的 Future
+        Args:
+            priority: PRIORITY_INTERACTIVE / PRIORITY_BULK
+            chatroom: 接收方 wxid，用于单群限速
+            send: 实际发送的无参异步函数
+        """
+        self._ensure_started()
+        slots = self._slots.get(priority)
+        if slots is None:
+            slots = self._slots[priority] = asyncio.Semaphore(self.max_size)
+        await slots.acquire()
+
+        item = _Outbound(chatroom, send, priority, asyncio.get_running_loop().create_future())
+        self._seq += 1
+        self._queue.put_nowait((priority, self._seq, item))
+        self.stats.submitted += 1
+        self._set_depth(priority, 1)
+        return item.future
+
+    async def send(self, priority: int, chatroom: str, send: Callable[[], Awaitable]):
+        """提交并等待发送完成，返回 send 的结果或抛出它的异常"""
+        return await (await self.submit(priority, chatroom, send))
+
+    def _set_depth(self, priority: int, delta: int):
+        self.stats.depth += delta
+        self.stats.max_depth = max(self.stats.max_depth, self.stats.depth)
+        depth = self._depths[priority] = self._depths.get(priority, 0) + delta
+        if self.metrics is not None:
+            self.metrics.set_gauge(OUTBOUND_DEPTH, depth, priority=_PRIORITY_NAMES.get(priority, priority))
+
+    def _release(self, item: _Outbound):
+        self._set_depth(item.priority, -1)
+        self._slots[item.priority].release()
+
+    def _chat_delay(self, chatroom: str) -> float:
+        """距离该群下一次允许发送还要等待的秒数，不需要等待时占用本次发送时间"""
+        now = time.monotonic()
+        delay = self._next_allowed.get(chatroom, 0.0) - now
+        if delay > 0:
+            return delay
+        self._next_allowed[chatroom] = now + self.chat_interval
+        if len(self._next_allowed) > 4096:
+            self._next_allowed = {k: v for k, v in self._next_allowed.items() if v > now}
+        return 0.0
+
+    def _requeue(self, entry: tuple):
+        del self._deferred[entry[1]]
+        self._queue.put_nowait(entry)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            item = entry[2]
+            if item.future.cancelled():
+                self._release(item)
+                continue
+
+            delay = self._chat_delay(item.chatroom)
+            if delay > 0:
+                # 单群限速：放回队列稍后再取，保持原有顺序号，不阻塞其他群的消息
+                self._deferred[entry[1]] = (loop.call_later(delay, self._requeue, entry), item)
+                continue
+
+            try:
+                await self._bucket.acquire()
+                wait = time.monotonic() - item.enqueued
+                self.stats.waits.append(wait)
+                if self.metrics is not None:
+                    self.metrics.observe(OUTBOUND_WAIT_SECONDS, wait,
+                                         priority=_PRIORITY_NAMES.get(item.priority, item.priority))
+                result = await item.send()
+            except Exception as e:
+                self.stats.failed += 1
+                if not item.future.done():
+                    item.future.set_exception(e)
+            except BaseException:
+                # stop() 取消 worker 时，正在发送的消息同样以 CancelledError 结束，调用方不会一直等待
+                item.future.cancel()
+                raise
+            else:
+                self.stats.sent += 1
+                if not item.future.done():
+                    item.future.set_result(result)
+            finally:
+                self._release(item)
+
+
+class QueuedBot:
+    """
+    把 bot 的 send_* 调用交给发送队列的代理，第一个参数作为接收方 wxid，其余属性原样转发
+    """
+
+    def __init__(self, bot, queue: OutboundQueue, priority: int):
+        self._bot = bot
+        self._queue = queue
+        self._priority = priority
+        self._wrapped = {}
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._bot, name)
+        if not name.startswith("send_") or not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            queue, priority = self._queue, self._priority
+
+            async def wrapped(wxid, *args, **kwargs):
+                return await queue.send(priority, wxid, lambda: attr(wxid, *args, **kwargs))
+
+            self._wrapped[name] = wrapped
+        return wrapped
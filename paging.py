@@ -0,0 +1,34 @@
+from typing import AsyncIterator, Callable
+
+
+def utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+async def paginate_rows(rows: AsyncIterator, format_line: Callable, max_bytes: int, reserved: int = 0,
+                        index: int = 0) -> AsyncIterator:
+    """
+    按字节预算把逐行读取的记录分页，每页尽量装满，只在内存中保留当前页
+    Args:
+        rows: 异步输出 (游标, 记录)
+        format_line: format_line(序号, 记录) -> 一行文本（不含换行符）
+        max_bytes: 每页最多字节数（UTF-8）
+        reserved: 每页预留给标题、页码等固定内容的字节数
+        index: 第一行之前已经显示过的行数，序号从 index + 1 开始
+    Yields:
+        (本页各行, 下一页起点)，下一页起点为 (本页最后一行的游标, 已显示行数)，最后一页为 None；
+        每页至少一行，单行超出预算时独占一页
+    """
+    lines, size, last_cursor = [], reserved, None
+    async for cursor, record in rows:
+        line = format_line(index + 1, record)
+        line_bytes = utf8_len(line) + 1
+        if lines and size + line_bytes > max_bytes:
+            yield lines, (last_cursor, index)
+            lines, size = [], reserved
+        lines.append(line)
+        size += line_bytes
+        index += 1
+        last_cursor = cursor
+    if lines:
+        yield lines, None
@@ -0,0 +1,36 @@
+import asyncio
+from typing import AsyncIterator
+
+_DONE = object()
+
+
+async def buffered(source: AsyncIterator, maxsize: int) -> AsyncIterator:
+    """
+    在后台任务中提前读取上游，最多缓存 maxsize 项，上下游可以同时工作；
+    缓存满时上游等待（背压），上游的异常在读到对应位置时抛出
+    """
+    queue = asyncio.Queue(max(int(maxsize), 1))
+
+    async def pump():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+            await queue.put((_DONE, None))
+        except Exception as e:
+            await queue.put((_DONE, e))
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+
+    task = asyncio.create_task(pump())
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,257 @@
+import asyncio
+import time
+from datetime import date
+from typing import Callable
+from urllib.parse import quote
+
+from loguru import logger
+
+from plugins.GoodMorning.fetcher import HttpFetcher
+from plugins.GoodMorning.weather_parser import format_today_weather, read_weather_json
+
+
+# MARK: - 天气
+class WeatherProvider:
+    """
+    天气数据源
+    max_batch: 单次请求最多查询的城市数量，1 表示不支持批量
+    """
+    type_name = ""
+    max_batch = 1
+
+    def __init__(self, name: str, fetcher: HttpFetcher, url: str, verify_ssl: bool = False, max_batch: int = None):
+        self.name = name
+        self.fetcher = fetcher
+        self.url = url
+        self.verify_ssl = verify_ssl
+        if max_batch is not None:
+            self.max_batch = max(int(max_batch), 1)
+
+    async def fetch_one(self, city: str) -> str:
+        """获取单个城市今天的天气，失败返回 "N/A" """
+        raise NotImplementedError
+
+    async def fetch_batch(self, cities: list) -> dict:
+        """获取一批城市今天的天气，返回 {城市: 天气}，默认逐个并发请求，单个城市失败时为 "N/A" """
+        results = await asyncio.gather(*(self.fetch_one(city) for city in cities), return_exceptions=True)
+        weather_map = {}
+        for city, result in zip(cities, results):
+            if isinstance(result, Exception):
+                logger.warning(f"数据源 {self.name} 获取天气失败: {city} {result!r}")
+                result = "N/A"
+            elif isinstance(result, BaseException):
+                raise result
+            weather_map[city] = result
+        return weather_map
+
+
+class Aa1WeatherProvider(WeatherProvider):
+    """v.api.aa1.cn 天气接口，响应前可能带有噪声内容"""
+    type_name = "aa1"
+
+    async def fetch_one(self, city: str) -> str:
+        url = self.url.format(city=quote(city))
+        json_data = await self.fetcher.get_with(url, read_weather_json, ssl=self.verify_ssl)
+        return format_today_weather(json_data, city)
+
+
+class BatchWeatherProvider(WeatherProvider):
+    """
+    支持批量查询的天气接口，url 中的 {cities} 为逗号分隔的城市列表，
+    响应格式 {"code": "1", "results": {城市: 与 aa1 相同结构的天气数据}}
+    """
+    type_name = "batch"
+    max_batch = 20
+
+    async def fetch_one(self, city: str) -> str:
+        return (await self.fetch_batch([city]))[city]
+
+    async def fetch_batch(self, cities: list) -> dict:
+        url = self.url.format(cities=quote(",".join(cities)))
+        resp = await self.fetcher.get_json(url, ssl=self.verify_ssl)
+        results = (resp.get("results") or {}) if resp.get("code") == "1" else {}
+        return {city: format_today_weather(results.get(city), city) for city in cities}
+
+
+# MARK: - 历史上的今天
+class HistoryProvider:
+    """
+    历史上的今天数据源
+    url 中带 {month} {day} 占位符时可以获取任意一天，否则只能获取当天
+    """
+    type_name = ""
+
+    def __init__(self, name: str, fetcher: HttpFetcher, url: str, verify_ssl: bool = False):
+        self.name = name
+        self.fetcher = fetcher
+        self.url = url
+        self.verify_ssl = verify_ssl
+        self.dated = "{month}" in url and "{day}" in url
+
+    def can_fetch(self, day: date) -> bool:
+        return self.dated or day == date.today()
+
+    async def fetch(self, day: date) -> list:
+        """获取某一天的历史事件，失败返回空列表"""
+        raise NotImplementedError
+
+
+class ApiMHistoryProvider(HistoryProvider):
+    """v2.api-m.com 历史上的今天接口"""
+    type_name = "api-m"
+
+    async def fetch(self, day: date) -> list:
+        url = self.url.format(month=day.month, day=day.day) if self.dated else self.url
+        resp = await self.fetcher.get_json(url, ssl=self.verify_ssl)
+        return [str(event) for event in resp.get("data") or []]
+
+
+PROVIDER_TYPES = {
+    provider.type_name: provider
+    for provider in (Aa1WeatherProvider, BatchWeatherProvider, ApiMHistoryProvider)
+}
+
+DEFAULT_PROVIDERS = {
+    "aa1": {"type": "aa1", "url": "https://v.api.aa1.cn/api/api-tianqi-3/index.php?msg={city}&type=1"},
+    "api-m": {"type": "api-m", "url": "https://v2.api-m.com/api/history"},
+}
+
+
+def build_providers(names: list, configs: dict, fetcher: HttpFetcher) -> list:
+    """
+    按配置创建数据源
+    Args:
+        names: 启用的数据源名称，按优先级排列
+        configs: {名称: {"type", "url", "verify_ssl", "max_batch"}}，未配置的名称使用内置默认值
+        fetcher: 共享 HTTP 客户端
+    """
+    providers = []
+    for name in names:
+        config = {**DEFAULT_PROVIDERS.get(name, {}), **configs.get(name, {})}
+        provider_class = PROVIDER_TYPES.get(config.get("type", ""))
+        if provider_class is None or not config.get("url"):
+            logger.error(f"数据源配置错误，已忽略: {name} {config}")
+            continue
+        kwargs = {"verify_ssl": config.get("verify_ssl", False)}
+        if "max_batch" in config:
+            kwargs["max_batch"] = config["max_batch"]
+        providers.append(provider_class(name, fetcher, config["url"], **kwargs))
+    return providers
+
+
+# MARK: - 故障切换
+class ProviderPool:
+    """
+    多数据源故障切换
+    记录每个数据源的耗时（指数移动平均）与失败情况，每次按得分从低到高依次尝试，
+    失败或结果无效时切换到下一个
+    """
+
+    def __init__(self, providers: list, alpha: float = 0.3, failure_penalty: float = 5.0):
+        self.providers = providers
+        self.alpha = alpha
+        self.failure_penalty = failure_penalty
+        self._latency = {provider.name: None for provider in providers}
+        self._failures = {provider.name: 0.0 for provider in providers}
+
+    def score(self, provider) -> float:
+        latency = self._latency[provider.name]
+        # 未测量过的按 0 处理，保证每个数据源都有机会被测量
+        return (latency or 0.0) + self._failures[provider.name] * self.failure_penalty
+
+    def ranked(self) -> list:
+        # sorted 是稳定排序，得分相同时保持配置顺序
+        return sorted(self.providers, key=self.score)
+
+    def _record(self, provider, elapsed: float, ok: bool):
+        latency = self._latency[provider.name]
+        self._latency[provider.name] = elapsed if latency is None else latency + self.alpha * (elapsed - latency)
+        failures = self._failures[provider.name]
+        self._failures[provider.name] = failures * (1 - self.alpha) + (0 if ok else 1) * self.alpha
+
+    async def call(self, operation: Callable, is_valid: Callable = None, providers: list = None):
+        """
+        依次尝试数据源执行 operation(provider)，返回第一个有效结果；全部失败时抛出最后一个异常或返回最后的结果
+        providers: 只尝试这些数据源（按给定顺序），默认按得分尝试全部
+        """
+        result, error = None, None
+        for provider in providers if providers is not None else self.ranked():
+            started = time.monotonic()
+            try:
+                result = await operation(provider)
+                ok = is_valid is None or is_valid(result)
+            except Exception as e:
+                error, ok = e, False
+                logger.warning(f"数据源 {provider.name} 请求失败: {e!r}")
+            self._record(provider, time.monotonic() - started, ok)
+            if ok:
+                return result
+        if result is None and error is not None:
+            raise error
+        return result
+
+    async def fetch_weathers(self, cities: list) -> dict:
+        """
+        按数据源的批量大小分组并发获取天气，返回 {城市: 天气}
+        按城市故障切换：每个数据源只请求之前的数据源没有获取到的城市，全部失败的城市为 "N/A"
+        """
+        if not self.providers:
+            return {city: "N/A" for city in cities}
+
+        batch_size = self.ranked()[0].max_batch
+
+        async def fetch_chunk(chunk: list) -> dict:
+            weather_map = {city: "N/A" for city in chunk}
+            remaining = chunk
+            for provider in self.ranked():
+                started = time.monotonic()
+                try:
+                    result = await self._fetch_with(provider, remaining)
+                except Exception as e:
+                    logger.warning(f"数据源 {provider.name} 请求失败: {e!r}")
+                    result = {}
+                fetched = {city: weather for city, weather in result.items() if weather != "N/A"}
+                self._record(provider, time.monotonic() - started, bool(fetched))
+                weather_map.update(fetched)
+                remaining = [city for city in remaining if city not in fetched]
+                if not remaining:
+                    break
+            return weather_map
+
+        chunks = [cities[i:i + batch_size] for i in range(0, len(cities), batch_size)]
+        weather_map = {}
+        for result in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            weather_map.update(result)
+        return weather_map
+
+    @staticmethod
+    async def _fetch_with(provider, cities: list) -> dict:
+        # 当前分组可能比该数据源支持的批量大，按它自己的批量拆开；失败的批次不影响其他批次，其中的城市不在结果中
+        size = provider.max_batch
+        batches = [cities[i:i + size] for i in range(0, len(cities), size)]
+        results = await asyncio.gather(*(provider.fetch_batch(batch) for batch in batches), return_exceptions=True)
+        weather_map = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, Exception):
+                logger.warning(f"数据源 {provider.name} 请求失败: {batch} {result!r}")
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                weather_map.update(result)
+        return weather_map
+
+    def can_fetch_history(self, day: date) -> bool:
+        """是否有数据源可以获取这一天的历史事件"""
+        return any(provider.can_fetch(day) for provider in self.providers)
+
+    async def fetch_history(self, day: date) -> list:
+        """获取某一天的历史事件，只使用可以获取这一天的数据源，全部失败返回空列表"""
+        providers = [provider for provider in self.ranked() if provider.can_fetch(day)]
+        if not providers:
+            return []
+        try:
+            return await self.call(lambda provider: provider.fetch(day), is_valid=bool,
+                                   providers=providers) or []
+        except Exception as e:
+            logger.error(f"获取历史上的今天异常: {day} {e}")
+            return []
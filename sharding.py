@@ -0,0 +1,31 @@
+import bisect
+import hashlib
+
+
+def _hash(key: str) -> int:
+    # 不能用内置 hash()，它在不同进程间不稳定
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    一致性哈希环
+    每个分片在环上放置 vnodes 个虚拟节点，群聊 wxid 落在顺时针方向的第一个节点所属分片
+    """
+
+    def __init__(self, shard_count: int, vnodes: int = 160):
+        self.shard_count = max(int(shard_count), 1)
+        points = sorted(
+            (_hash(f"shard-{shard}#{vnode}"), shard)
+            for shard in range(self.shard_count)
+            for vnode in range(vnodes)
+        )
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_of(self, key: str) -> int:
+        """返回 key 所属的分片编号"""
+        if self.shard_count == 1:
+            return 0
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._shards[index]
@@ -0,0 +1,71 @@
+"""
+GoodMorningDB 异步接口测试
+在 XYBot 根目录运行: python -m pytest plugins/GoodMorning/tests
+
+使用临时 SQLite 数据库，验证大批量写入在数据库线程中执行时事件循环仍能继续处理其他协程。
+"""
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+try:
+    from plugins.GoodMorning.good_morning_db import GoodMorningDB
+except ImportError:  # 不在 XYBot 环境中（缺少 database 模块或 sqlalchemy）
+    GoodMorningDB = None
+
+ROWS = 20000
+TICK = 0.005
+
+
+@unittest.skipIf(GoodMorningDB is None, "需要在 XYBot 环境中运行")
+class AsyncWriteResponsivenessTest(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        # GoodMorningDB 是单例，先用临时数据库初始化
+        cls.tmp_dir = tempfile.TemporaryDirectory(prefix="goodmorning-test-")
+        cls.db = GoodMorningDB(f"sqlite:///{os.path.join(cls.tmp_dir.name, 'test.db')}")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.engine.dispose()
+        cls.tmp_dir.cleanup()
+
+    async def test_loop_keeps_running_during_bulk_writes(self):
+        ticks = []
+        stop = asyncio.Event()
+
+        async def ticker():
+            while not stop.is_set():
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(TICK)
+
+        ticker_task = asyncio.create_task(ticker())
+        await asyncio.sleep(TICK * 2)
+        started = time.perf_counter()
+        try:
+            blacklist_ok = await self.db.async_add_blacklist_bulk(
+                [(f"b{i}@chatroom", f"黑名单群{i}") for i in range(ROWS)])
+            weather_ok = await self.db.async_add_weather_bulk(
+                [(f"w{i}@chatroom", f"天气群{i}", "重庆") for i in range(ROWS)])
+            blacklist = await self.db.async_get_blacklist()
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await ticker_task
+
+        self.assertTrue(blacklist_ok)
+        self.assertTrue(weather_ok)
+        self.assertGreaterEqual(len(blacklist), ROWS)
+
+        # 写入期间 ticker 持续运行：没有长时间停顿，且大致按节拍执行
+        during = [t for t in ticks if t >= started]
+        gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+        self.assertLess(max(gaps), 0.25, f"事件循环最长停顿 {max(gaps):.3f}s")
+        self.assertGreaterEqual(len(during), min(10, int(elapsed / TICK / 4)),
+                                f"写入耗时 {elapsed:.3f}s，期间 ticker 只运行了 {len(during)} 次")
+
+
+if __name__ == "__main__":
+    unittest.main()
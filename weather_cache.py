@@ -0,0 +1,78 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+
+from loguru import logger
+
+
+class WeatherCache:
+    """
+    天气缓存
+    以 (城市, 日期) 为键，带过期时间与 LRU 淘汰，可选落盘快照
+    """
+
+    def __init__(self, ttl: float = 6 * 3600, max_size: int = 1024, snapshot_path: str = ""):
+        self.ttl = ttl
+        self.max_size = max(int(max_size), 1)
+        self.snapshot_path = snapshot_path
+        self._data = OrderedDict()  # (city, date) -> (expire_at, weather)
+
+    @staticmethod
+    def _key(city: str, day: Optional[date] = None) -> tuple:
+        return city, (day or date.today()).isoformat()
+
+    def get(self, city: str, day: Optional[date] = None) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None"""
+        key = self._key(city, day)
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expire_at, weather = entry
+        if expire_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return weather
+
+    def set(self, city: str, weather: str, day: Optional[date] = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        key = self._key(city, day)
+        self._data[key] = (time.time() + self.ttl, weather)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    # MARK: - 快照
+    def load_snapshot(self):
+        """从磁盘快照恢复未过期的条目"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            now = time.time()
+            for city, day, expire_at, weather in entries:
+                if expire_at > now:
+                    self._data[(city, day)] = (expire_at, weather)
+            logger.info(f"天气缓存快照已加载: {len(self._data)} 条")
+        except Exception as e:
+            logger.error(f"加载天气缓存快照失败: {e}")
+
+    def save_snapshot(self):
+        """将当前缓存写入磁盘快照（先写临时文件再替换）"""
+        if not self.snapshot_path:
+            return
+        try:
+            entries = [[city, day, expire_at, weather] for (city, day), (expire_at, weather) in self._data.items()]
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.error(f"保存天气缓存快照失败: {e}")
@@ -0,0 +1,112 @@
+import json
+import re
+from datetime import datetime
+from typing import Optional
+
+from loguru import logger
+
+# 天气 JSON 的起始位置，只匹配开头几个字符，不会整段回溯
+_WEATHER_JSON_START = re.compile(rb'\{\s*"code"\s*:\s*"1"')
+
+# 响应体最多读取的字节数，防止异常响应占用内存
+MAX_BODY_BYTES = 256 * 1024
+
+_WEEKDAY_NAMES = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+
+_DECODER = json.JSONDecoder()
+
+
+class WeatherJsonScanner:
+    """
+    增量扫描天气 JSON 对象
+    逐块输入响应字节，找到 {"code":"1" 起始位置后用 raw_decode 只解析这一个对象（忽略其后的内容），
+    对象完整即可停止读取
+    """
+
+    def __init__(self, max_bytes: int = MAX_BODY_BYTES):
+        self.max_bytes = max_bytes
+        self._buffer = bytearray()
+        self._start = -1
+        self._searched = 0
+        self.data = None
+
+    @property
+    def done(self) -> bool:
+        return self.data is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        """输入一块数据，返回对象是否已经完整"""
+        if self.done:
+            return True
+        self._buffer += chunk
+        if len(self._buffer) > self.max_bytes:
+            raise ValueError(f"天气响应超过 {self.max_bytes} 字节")
+
+        if self._start < 0:
+            # 起始标记可能跨块，从上次位置往前留一点余量重新查找
+            match = _WEATHER_JSON_START.search(self._buffer, max(0, self._searched - 32))
+            self._searched = len(self._buffer)
+            if match is None:
+                return False
+            self._start = match.start()
+        elif b"}" not in chunk:
+            # 对象只可能在 } 处结束
+            return False
+
+        try:
+            # 块末尾可能截断多字节字符，忽略即可：截断处之前对象若已完整仍可解析
+            data, _ = _DECODER.raw_decode(self._buffer[self._start:].decode("utf-8", "ignore"))
+        except json.JSONDecodeError:
+            return False
+        if isinstance(data, dict):
+            self.data = data
+        return self.done
+
+    def result(self) -> Optional[dict]:
+        """返回扫描到的对象，未找到或不完整返回 None"""
+        return self.data
+
+
+async def read_weather_json(response, chunk_size: int = 8192) -> Optional[dict]:
+    """
+    流式读取 aiohttp 响应并提取天气 JSON，对象闭合后不再读取剩余内容
+    """
+    scanner = WeatherJsonScanner()
+    head = bytearray()
+    async for chunk in response.content.iter_chunked(chunk_size):
+        if len(head) < 64:
+            head += chunk[:64]
+        if scanner.feed(chunk):
+            break
+
+    data = scanner.result()
+    if data is None:
+        logger.error(f"未找到完整的天气JSON数据: {bytes(head)!r}")
+    return data
+
+
+def index_days(weather_data: dict) -> dict:
+    """按 riqi（周一~周日）索引每天的天气"""
+    days = {}
+    for day_data in weather_data.get("data") or []:
+        days.setdefault(day_data.get("riqi"), day_data)
+    return days
+
+
+def format_today_weather(weather_data: Optional[dict], city: str) -> str:
+    """从天气数据中获取今天的天气信息"""
+    if not weather_data or weather_data.get("code") != "1" or not weather_data.get("data"):
+        return "N/A"
+
+    today = index_days(weather_data).get(_WEEKDAY_NAMES[datetime.now().weekday()])
+    if not today:
+        return "N/A"
+
+    # 格式化天气信息
+    return (
+        f"{city}今日天气：\n"
+        f"温度：{today.get('wendu', '未知')}\n"
+        f"天气：{today.get('tianqi', '未知')}\n"
+        # f"风力：{today.get('fengdu', '未知')}\n"
+        f"空气质量：{today.get('pm', '未知')}"
+    )